@@ -0,0 +1,127 @@
+"""
+昂贵接口的准入控制：每个路由模板有独立的并发上限、排队上限与排队超时，
+排队已满时立即返回 429，排队超时返回 503，避免少数重请求占满 worker、拖慢廉价的按 id 查询。
+另提供 Coalescer：相同参数的进行中计算只执行一次，其余请求等待同一个结果。
+"""
+import asyncio
+
+from starlette.responses import JSONResponse
+from starlette.routing import compile_path
+
+from config import config
+
+
+class Overloaded(Exception):
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+
+
+class RouteLimiter:
+    def __init__(self, route: str, concurrency: int, queue_size: int, timeout: float):
+        self.route = route
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.waiting = 0
+        self.active = 0
+        self.rejected = {429: 0, 503: 0}
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def acquire(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.queue_size:
+                self.rejected[429] += 1
+                raise Overloaded(429, "Too many concurrent requests for this endpoint, please retry later")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.rejected[503] += 1
+                raise Overloaded(503, "Endpoint is overloaded, please retry later")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+
+limiters = [RouteLimiter(route, int(concurrency), int(queue_size), float(timeout))
+            for route, (concurrency, queue_size, timeout) in config.ADMISSION_LIMITS.items()]
+_patterns = [(compile_path(limiter.route)[0], limiter) for limiter in limiters]
+
+
+def match_limiter(path: str):
+    for pattern, limiter in _patterns:
+        if pattern.match(path):
+            return limiter
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    ASGI 中间件：按路径匹配 ADMISSION_LIMITS 中的路由模板，占用并发名额直到响应（包括流式响应体）发送完毕。
+    在路由之前执行，被拒绝的请求不会进入接口代码。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limiter = match_limiter(scope["path"]) if scope["type"] == "http" and config.ADMISSION_ENABLED else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code,
+                                    headers={"Retry-After": str(max(1, round(limiter.timeout)))})
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+class Coalescer:
+    """ 相同 key 的进行中计算只执行一次；等待方被取消时不会取消共享的计算 """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def run(self, key, func, *args):
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func(*args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+
+inflight = Coalescer()
+
+
+def admission_metric_lines() -> list:
+    lines = [
+        "# HELP admission_active_requests Requests holding a concurrency slot",
+        "# TYPE admission_active_requests gauge",
+    ]
+    lines += [f'admission_active_requests{{route="{limiter.route}"}} {limiter.active}' for limiter in limiters]
+    lines += [
+        "# HELP admission_queued_requests Requests waiting for a concurrency slot",
+        "# TYPE admission_queued_requests gauge",
+    ]
+    lines += [f'admission_queued_requests{{route="{limiter.route}"}} {limiter.waiting}' for limiter in limiters]
+    lines += [
+        "# HELP admission_rejected_total Requests rejected by admission control",
+        "# TYPE admission_rejected_total counter",
+    ]
+    lines += [f'admission_rejected_total{{route="{limiter.route}",status="{status}"}} {count}'
+              for limiter in limiters for status, count in limiter.rejected.items()]
+    return lines
@@ -0,0 +1,197 @@
+"""
+BDOS 预览页面（远端 .html.gz）的异步获取与磁盘缓存。
+
+- 上游响应边下载边转发给客户端，同时写入缓存，不再使用临时文件
+- 客户端接受 gzip 时原样透传压缩数据，否则边读边解压
+- 同一 URL 正在下载时，其余请求等待下载写入缓存后直接读取缓存，不重复请求上游
+- 缓存按 URL 哈希存放，带上游 ETag；过期后用 If-None-Match 重新验证；总大小超限时淘汰最久未用的文件
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+import zlib
+
+from fastapi import HTTPException
+
+from compression import accepted_codings
+from config import config
+
+CHUNK_SIZE = 64 * 1024
+
+_client = None
+# URL -> 下载完成（或失败）时触发的事件
+_downloads = {}
+
+
+def get_client() -> "httpx.AsyncClient":
+    global _client
+    if _client is None:
+        import httpx
+
+        _client = httpx.AsyncClient(timeout=config.BDOS_FETCH_TIMEOUT_SECONDS, follow_redirects=True)
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """ Accept-Encoding 中 gzip（或 *）的 q 值大于 0 时返回 True """
+    codings = accepted_codings(accept_encoding)
+    return codings.get("gzip", codings.get("*", 0.0)) > 0
+
+
+class BdosCache:
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+    def paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return f"{base}.html.gz", f"{base}.json"
+
+    def lookup(self, url: str):
+        """ 返回 (数据文件路径, 元信息)，未缓存时返回 (None, None) """
+        data_path, meta_path = self.paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None, None
+        if not os.path.exists(data_path):
+            return None, None
+        return data_path, meta
+
+    def is_fresh(self, meta: dict) -> bool:
+        return time.time() - meta.get("fetched_at", 0) < self.ttl_seconds
+
+    def mark_validated(self, url: str, meta: dict):
+        data_path, meta_path = self.paths(url)
+        meta["fetched_at"] = time.time()
+        self._write_meta(meta_path, meta)
+        os.utime(data_path)
+
+    def _write_meta(self, meta_path: str, meta: dict):
+        tmp_path = f"{meta_path}.{os.getpid()}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    async def tee(self, url: str, response: "httpx.Response"):
+        """ 转发上游的压缩数据，同时写入缓存；完整下载后才替换为正式缓存文件 """
+        os.makedirs(self.directory, exist_ok=True)
+        data_path, meta_path = self.paths(url)
+        part_path = f"{data_path}.{os.getpid()}.{id(response)}.part"
+        completed = False
+        try:
+            with open(part_path, "wb") as f:
+                async for chunk in response.aiter_raw(CHUNK_SIZE):
+                    f.write(chunk)
+                    yield chunk
+            os.replace(part_path, data_path)
+            self._write_meta(meta_path, {"url": url, "etag": response.headers.get("etag"), "fetched_at": time.time()})
+            completed = True
+            self.evict()
+        finally:
+            await response.aclose()
+            if not completed and os.path.exists(part_path):
+                os.remove(part_path)
+            _finish_download(url)
+
+    def evict(self):
+        """ 总大小超过上限时按最近使用时间淘汰 """
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".html.gz"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for victim in (path, path[:-len(".html.gz")] + ".json"):
+                if os.path.exists(victim):
+                    os.remove(victim)
+            total -= size
+
+
+bdos_cache = BdosCache(config.BDOS_CACHE_DIR, config.BDOS_CACHE_MAX_BYTES, config.BDOS_CACHE_TTL_SECONDS)
+
+
+async def iter_file(path: str):
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+async def gunzip_chunks(chunks):
+    """ 边读边解压 gzip 数据 """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def _finish_download(url: str):
+    event = _downloads.pop(url, None)
+    if event is not None:
+        event.set()
+
+
+async def open_bdos(url: str):
+    """ 返回 gzip 压缩的 HTML 数据块的异步迭代器：优先使用缓存，过期时向上游重新验证 """
+    import httpx
+
+    pending = _downloads.get(url)
+    if pending is not None:
+        # 客户端中途断开时下载可能迟迟不结束，等待超时后自行请求上游
+        try:
+            await asyncio.wait_for(pending.wait(), config.BDOS_FETCH_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+    data_path, meta = bdos_cache.lookup(url)
+    if data_path and bdos_cache.is_fresh(meta):
+        os.utime(data_path)
+        return iter_file(data_path)
+
+    headers = {}
+    if data_path and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    client = get_client()
+    _downloads.setdefault(url, asyncio.Event())
+    try:
+        response = await client.send(client.build_request("GET", url, headers=headers), stream=True)
+    except httpx.HTTPError as e:
+        _finish_download(url)
+        raise HTTPException(status_code=500, detail=f"Error downloading file: {e}")
+
+    if response.status_code == 304 and data_path:
+        await response.aclose()
+        bdos_cache.mark_validated(url, meta)
+        _finish_download(url)
+        return iter_file(data_path)
+    if response.is_error:
+        await response.aclose()
+        _finish_download(url)
+        raise HTTPException(status_code=500, detail=f"Error downloading file: HTTP {response.status_code}")
+    # tee 结束（完成或失败）时触发事件
+    return bdos_cache.tee(url, response)
@@ -0,0 +1,55 @@
+"""
+worker 冷启动的导入耗时检查：在子进程中 `python -X importtime -c "import main"`，
+超过阈值或导入了本应延迟加载的重量级依赖时以非零状态退出，可放进 CI 作为回归检查。
+
+用法：
+    python benchmarks/import_time.py --max-ms 1500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 只应由具体接口按需导入的包。numpy 不在其中：摘要索引在 lifespan 中加载、numeric / fingerprint 的
+# 模块级常量也依赖它，worker 接收第一个请求之前总会导入，延迟导入不会缩短就绪时间（约 40 ms）
+LAZY_PACKAGES = ("pandas", "plotly", "pymatgen", "httpx", "pyarrow")
+
+
+def measure(module: str):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    total_us = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        imported.add(name.split(".")[0])
+        if name == module:
+            total_us = int(cumulative)
+    return total_us / 1000, sorted(imported & set(LAZY_PACKAGES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="import-time regression check")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--max-ms", type=float, default=1500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    best_ms = min(ms for ms, _ in runs)
+    eager = runs[0][1]
+    report = {"module": args.module, "import_ms": round(best_ms, 1), "max_ms": args.max_ms,
+              "eagerly_imported_heavy_packages": eager}
+    print(json.dumps(report, indent=2))
+    if best_ms > args.max_ms or eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+简单压测脚本：对正在运行的 API（连接本地 mongod）按固定并发发请求，输出 RPS 与延迟分位数。
+
+用法：
+    uvicorn main:app --port 8000
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8000 \
+        --path /api/material/671e1961ab159a6f6ac9fdd6 --concurrency 32 --requests 2000
+
+分别在改动前后的代码上运行，对比输出的 rps 与 p99_ms。
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def run(base_url: str, paths, concurrency: int, total: int):
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                path = paths[i % len(paths)]
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "paths": paths,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API load test")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", action="append", required=True, help="可重复指定，轮流请求")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.base_url, args.path, args.concurrency, args.requests))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+登录吞吐压测：在不同并发下调用 /auth/login，统计 RPS、延迟分位数和被拒绝（429）的请求数。
+
+用法：
+    python benchmarks/login_bench.py --email user@example.com --password secret --concurrency 1 8 32
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from load_test import percentile
+
+
+async def run(base_url: str, email: str, password: str, concurrency: int, total: int):
+    latencies = []
+    status_counts = {}
+    counter = iter(range(total))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        async def worker():
+            for _ in counter:
+                start = time.perf_counter()
+                response = await client.post("/auth/login", json={"email": email, "password": password})
+                latencies.append((time.perf_counter() - start) * 1000)
+                status_counts[response.status_code] = status_counts.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "status_counts": status_counts,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="login throughput benchmark")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    results = [asyncio.run(run(args.base_url, args.email, args.password, c, args.requests))
+               for c in args.concurrency]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+对比整文档读取与按 section projection 读取：每次请求传输的 BSON 字节数与解码耗时。
+
+用法：
+    python benchmarks/projection_bench.py --sample 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import bson
+from bson.raw_bson import RawBSONDocument
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config  # noqa: E402
+from sections import SECTION_FIELDS, section_projection  # noqa: E402
+
+
+def measure(collection, ids, projection):
+    total_bytes = 0
+    decode_seconds = 0.0
+    for _id in ids:
+        raw = collection.find_one({"_id": _id}, projection)
+        if raw is None:
+            continue
+        total_bytes += len(raw.raw)
+        start = time.perf_counter()
+        bson.decode(raw.raw)
+        decode_seconds += time.perf_counter() - start
+    n = max(len(ids), 1)
+    return {"bytes_per_request": total_bytes // n, "decode_us_per_request": round(decode_seconds / n * 1e6, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="section projection benchmark")
+    parser.add_argument("--sample", type=int, default=200)
+    args = parser.parse_args()
+
+    client = MongoClient(config.MONGO_URI, document_class=RawBSONDocument)
+    collection = client[config.DB][config.COLLECTION]
+    ids = [doc["_id"] for doc in collection.find({}, {"_id": 1}).limit(args.sample)]
+
+    full = measure(collection, ids, None)
+    report = {"full_document": full}
+    for section, paths in SECTION_FIELDS.items():
+        if paths is None:
+            continue
+        sliced = measure(collection, ids, section_projection(section))
+        sliced["bytes_saved_pct"] = round(100 * (1 - sliced["bytes_per_request"] / max(full["bytes_per_request"], 1)), 1)
+        report[section] = sliced
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
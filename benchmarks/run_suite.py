@@ -0,0 +1,214 @@
+"""
+可复现的整套压测：对 routes/materials.py 中的每个接口以及 /auth/login，按若干固定并发级别发请求，
+输出每个 (接口, 并发) 的 RPS、p50/p95/p99 延迟和服务进程内存（取自 /metrics），结果写成 JSON 便于前后对比。
+
+用法：
+    python benchmarks/seed.py                      # 写入合成数据与压测账号
+    MONGO_URI=mongodb://localhost:27017 DB=carbon_et_bench COLLECTION=materials USER_COLLECTION=users \
+        uvicorn main:app --port 8000               # 单 worker 运行，/metrics 的内存才对应整个服务
+    python benchmarks/run_suite.py --concurrency 1,16,64 --output before.json
+    ...改动代码后...
+    python benchmarks/run_suite.py --concurrency 1,16,64 --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import time
+
+import httpx
+
+from load_test import percentile
+from seed import BENCH_EMAIL, BENCH_PASSWORD
+
+# (名称, 方法, 路径模板, 请求体, 请求数倍率)；{id} 会轮流替换为真实的材料 id
+SCENARIOS = [
+    ("material", "GET", "/api/material/{id}", None, 1.0),
+    ("opt", "GET", "/api/opt/{id}", None, 1.0),
+    ("scf", "GET", "/api/scf/{id}", None, 1.0),
+    ("elastic", "GET", "/api/elastic/{id}", None, 1.0),
+    ("ElasticProp", "GET", "/api/ElasticProp/{id}", None, 1.0),
+    ("band", "GET", "/api/band/{id}", None, 1.0),
+    ("material_basicprop", "GET", "/api/material_basicprop/{id}", None, 1.0),
+    ("materials_batch", "POST", "/api/materials/batch", "batch", 0.5),
+    ("materials_ndjson", "GET", "/api/materials?format=ndjson&fields=formula,Sites", None, 0.02),
+    ("materials_search", "GET", "/api/materials/search?crystal_system=cubic&sites_min=8", None, 1.0),
+    ("materials_search_numeric", "GET", "/api/materials/search?band_gap_min=1&band_gap_max=3", None, 0.5),
+    ("materials_summary_page", "GET", "/api/materials_summary?page={page}", None, 1.0),
+    ("materials_summary_sorted", "GET", "/api/materials_summary?sort=Sites&cursor=", None, 1.0),
+    ("charts", "GET", "/api/charts", None, 0.2),
+    ("download_csv", "GET", "/api/download", None, 0.2),
+    ("download_cif", "GET", "/api/download/{id}", None, 0.5),
+    ("bdos", "GET", "/api/get_bdos_url/{id}", None, 0.2),
+    ("login", "POST", "/auth/login", "login", 0.2),
+]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def read_memory(client: httpx.AsyncClient) -> dict:
+    """ 从 /metrics 中取进程当前与峰值常驻内存 """
+    memory = {}
+    try:
+        response = await client.get("/metrics")
+    except httpx.HTTPError:
+        return memory
+    for line in response.text.splitlines():
+        if line.startswith("process_resident_memory_bytes "):
+            memory["rss_bytes"] = int(line.split()[1])
+        elif line.startswith("process_max_resident_memory_bytes "):
+            memory["max_rss_bytes"] = int(line.split()[1])
+    return memory
+
+
+async def material_ids(client: httpx.AsyncClient, limit: int) -> list:
+    response = await client.get("/api/materials_summary", params={"page_size": limit})
+    response.raise_for_status()
+    return [material["_id"] for material in response.json()["materials"]]
+
+
+def make_request(method: str, template: str, body_kind, ids: list, i: int):
+    path = template.format(id=ids[i % len(ids)], page=i % 50 + 1)
+    body = None
+    if body_kind == "batch":
+        batch = [ids[(i + k) % len(ids)] for k in range(20)]
+        body = {"ids": batch, "sections": ["basicprop", "band"]}
+    elif body_kind == "login":
+        body = {"email": BENCH_EMAIL, "password": BENCH_PASSWORD}
+    return method, path, body
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario, ids: list, concurrency: int, total: int,
+                       warmup: int) -> dict:
+    name, method, template, body_kind, _ = scenario
+    latencies = []
+    errors = 0
+    received = 0
+
+    async def send(i):
+        nonlocal errors, received
+        request_method, path, body = make_request(method, template, body_kind, ids, i)
+        start = time.perf_counter()
+        try:
+            async with client.stream(request_method, path, json=body) as response:
+                async for chunk in response.aiter_raw():
+                    received += len(chunk)
+                if response.status_code >= 400:
+                    errors += 1
+        except httpx.HTTPError:
+            errors += 1
+        return (time.perf_counter() - start) * 1000
+
+    for i in range(warmup):
+        await send(i)
+    errors = received = 0
+
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            latencies.append(await send(i))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_bytes": round(received / total) if total else 0,
+        **await read_memory(client),
+    }
+
+
+async def run(args) -> dict:
+    selected = [s for s in SCENARIOS if not args.scenario or s[0] in args.scenario]
+    results = []
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        ids = await material_ids(client, args.ids)
+        # 开启 AUTH_REQUIRED_FOR_MATERIALS 时材料接口需要 token；未开启时该请求头会被忽略
+        login = await client.post("/auth/login", json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+        if login.status_code == 200:
+            client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+        memory_before = await read_memory(client)
+
+        for concurrency in args.concurrency:
+            for scenario in selected:
+                total = max(concurrency, int(args.requests * scenario[4]))
+                result = await run_scenario(client, scenario, ids, concurrency, total, args.warmup)
+                results.append(result)
+                print(f"{result['scenario']:<28} c={concurrency:<4} rps={result['rps']:<9} "
+                      f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms errors={result['errors']}")
+
+    return {
+        "meta": {
+            "base_url": args.base_url,
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "memory_before": memory_before,
+        },
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict) -> list:
+    """ 按 (接口, 并发) 对比两次运行，返回 rps 与 p99 的相对变化 """
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    rows = []
+    for result in report["results"]:
+        old = previous.get((result["scenario"], result["concurrency"]))
+        if old is None or not old["rps"] or not old["p99_ms"]:
+            continue
+        rows.append({
+            "scenario": result["scenario"],
+            "concurrency": result["concurrency"],
+            "rps_change_pct": round((result["rps"] / old["rps"] - 1) * 100, 1),
+            "p99_change_pct": round((result["p99_ms"] / old["p99_ms"] - 1) * 100, 1),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="reproducible API load-test suite")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 16, 64],
+                        help="逗号分隔的并发级别")
+    parser.add_argument("--requests", type=int, default=1000, help="每个接口每个并发级别的基准请求数")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--ids", type=int, default=200, help="轮流请求的材料 id 数量")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--scenario", action="append", help="只运行指定接口，可重复")
+    parser.add_argument("--output", default=None, help="结果 JSON 文件")
+    parser.add_argument("--compare", default=None, help="与之前的结果 JSON 对比")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare(report, json.load(f))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+向本地 MongoDB 写入与真实数据形状一致的合成碳材料（以及一个压测用账号），供 run_suite.py 使用。
+
+用法：
+    python benchmarks/seed.py --uri mongodb://localhost:27017 --db carbon_et_bench --count 2300
+然后以相同的库启动服务：
+    MONGO_URI=mongodb://localhost:27017 DB=carbon_et_bench COLLECTION=materials USER_COLLECTION=users \
+        uvicorn main:app --port 8000
+"""
+import argparse
+import csv
+import os
+import random
+
+import bcrypt
+from bson import ObjectId
+from pymongo import MongoClient
+
+from synthetic import make_material_doc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+
+
+def read_csv_rows(path: str) -> list:
+    """ et_carbon.csv 中的真实摘要字段，合成文档会沿用这些分布 """
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def make_docs(rows: list, count: int, rng: random.Random, bdos_url: str = None) -> list:
+    """ 前 len(rows) 个文档沿用 CSV 中的 _id / 化学式 / 晶系 / 原子数，超出部分复用这些分布，_id 由 rng 生成 """
+    docs = []
+    for i in range(count):
+        row = rows[i % len(rows)]
+        doc = make_material_doc(rng, sites=int(row["Sites"]), crystal_system=row["crystal_system"])
+        if i < len(rows):
+            doc["_id"] = ObjectId(row["_id"])
+        doc["formula"] = row["formula"]
+        doc["space_group_symbol"] = row["space_group_symbol"]
+        if bdos_url:
+            doc["bdos_url"] = bdos_url
+        docs.append(doc)
+    return docs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="seed a local MongoDB with synthetic carbon structures")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="carbon_et_bench")
+    parser.add_argument("--collection", default="materials")
+    parser.add_argument("--users", default="users")
+    parser.add_argument("--count", type=int, default=None, help="默认与 et_carbon.csv 行数相同")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bdos-url", default=None, help="可选：写入每个文档的 bdos_url（例如本地静态服务器上的 .html.gz）")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    args = parser.parse_args()
+
+    rows = read_csv_rows(os.path.join(ROOT, "static", "et_carbon.csv"))
+    docs = make_docs(rows, args.count or len(rows), random.Random(args.seed), args.bdos_url)
+
+    client = MongoClient(args.uri)
+    db = client[args.db]
+    db[args.collection].drop()
+    db[args.collection].insert_many(docs, ordered=False)
+    db[args.users].delete_many({"email": BENCH_EMAIL})
+    db[args.users].insert_one({
+        "firstname": "bench",
+        "email": BENCH_EMAIL,
+        "password_hash": bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=args.bcrypt_rounds)),
+    })
+    # 与 database.bump_collection_version 相同：让已运行的服务重新加载摘要索引并清空缓存
+    db["meta"].update_one({"_id": args.collection}, {"$inc": {"version": 1}}, upsert=True)
+    print(f"seeded {len(docs)} materials into {args.db}.{args.collection}")
+
+
+if __name__ == "__main__":
+    main()
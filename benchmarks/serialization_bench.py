@@ -0,0 +1,48 @@
+"""
+MaterialData 整份文档的 校验 + JSON 编码 微基准：
+旧路径（parse_obj + jsonable_encoder + json.dumps）对比 TypeAdapter / orjson / 信任数据直接编码。
+
+用法：
+    python benchmarks/serialization_bench.py --number 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes.materials import MATERIAL_ADAPTER, MaterialData  # noqa: E402
+from synthetic import make_material_doc  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MaterialData serialization benchmark")
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    doc = make_material_doc(random.Random(0))
+    doc["_id"] = str(doc["_id"])
+
+    cases = {
+        # 旧实现：v1 风格 parse_obj，再经 FastAPI 的 jsonable_encoder 与标准库 json 编码
+        "parse_obj+jsonable_encoder+json": lambda: json.dumps(jsonable_encoder(MaterialData.parse_obj(doc))),
+        "model_validate+model_dump_json": lambda: MaterialData.model_validate(doc).model_dump_json(by_alias=True),
+        "type_adapter validate+dump_json": lambda: MATERIAL_ADAPTER.dump_json(
+            MATERIAL_ADAPTER.validate_python(doc), by_alias=True),
+        "trusted orjson.dumps": lambda: orjson.dumps(doc, default=str),
+    }
+    report = {}
+    for name, func in cases.items():
+        seconds = min(timeit.repeat(func, number=args.number, repeat=3))
+        report[name] = {"us_per_doc": round(seconds / args.number * 1e6, 2)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
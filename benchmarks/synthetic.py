@@ -0,0 +1,116 @@
+"""
+生成与真实数据结构一致的合成碳材料文档（structure + metadata 的 opt / scf / elastic / band），供压测与基准使用。
+"""
+import random
+
+from bson import ObjectId
+
+CRYSTAL_SYSTEMS = {
+    "cubic": ["Fd-3m", "Pm-3m", "Ia-3"],
+    "hexagonal": ["P6_3/mmc", "P6/mmm", "P-6m2"],
+    "trigonal": ["R-3m", "P-3m1"],
+    "tetragonal": ["P4_2/mmc", "I4/mmm", "P4/mbm"],
+    "orthorhombic": ["Cmcm", "Pnma", "Imma"],
+    "monoclinic": ["C2/m", "P2_1/c"],
+    "triclinic": ["P-1"],
+}
+
+INCAR = "SYSTEM = C\nENCUT = 520\nISMEAR = 0\nSIGMA = 0.05\nEDIFF = 1E-6\nIBRION = 2\nISIF = 3\nNSW = 200\n"
+KPOINTS = "Automatic mesh\n0\nGamma\n  9 9 9\n  0 0 0\n"
+
+
+def make_structure(rng: random.Random, sites: int) -> dict:
+    a = rng.uniform(2.4, 12.0)
+    lattice = [[a, 0.0, 0.0], [0.0, a * rng.uniform(0.8, 1.2), 0.0], [0.0, 0.0, a * rng.uniform(0.8, 1.6)]]
+    return {
+        "@module": "pymatgen.core.structure",
+        "@class": "Structure",
+        "charge": 0,
+        "lattice": {"matrix": lattice, "pbc": [True, True, True]},
+        "properties": {},
+        "sites": [
+            {
+                "species": [{"element": "C", "occu": 1}],
+                "abc": [rng.random(), rng.random(), rng.random()],
+                "properties": {},
+                "label": "C",
+            }
+            for _ in range(sites)
+        ],
+    }
+
+
+def make_contcar(structure: dict) -> str:
+    lines = ["C", "1.0"]
+    lines += ["  ".join(f"{x:.10f}" for x in row) for row in structure["lattice"]["matrix"]]
+    lines += ["C", str(len(structure["sites"])), "Direct"]
+    lines += ["  ".join(f"{x:.10f}" for x in site["abc"]) for site in structure["sites"]]
+    return "\n".join(lines) + "\n"
+
+
+def make_tensor(rng: random.Random, scale: float):
+    return [[round(rng.uniform(-0.1, 1.0) * scale, 4) for _ in range(6)] for _ in range(6)]
+
+
+def make_material_doc(rng: random.Random = None, with_id: bool = True, sites: int = None,
+                      crystal_system: str = None) -> dict:
+    rng = rng or random.Random()
+    crystal_system = crystal_system or rng.choice(list(CRYSTAL_SYSTEMS))
+    sites = sites or rng.choice([2, 4, 6, 8, 12, 16, 24, 32, 48, 64])
+    structure = make_structure(rng, sites)
+    contcar = make_contcar(structure)
+    stiffness = make_tensor(rng, 1000)
+    gap = round(rng.uniform(0, 6), 4)
+    doc = {
+        "sacada_id": str(rng.randint(1, 100000)),
+        "structure": structure,
+        "metadata": {
+            "opt": {"INCAR": INCAR, "KPOINTS": KPOINTS, "CONTCAR": contcar},
+            "scf": {"INCAR": INCAR.replace("IBRION = 2", "IBRION = -1"), "KPOINTS": KPOINTS, "CONTCAR": contcar},
+            "elastic": {
+                "INCAR": INCAR.replace("IBRION = 2", "IBRION = 6"),
+                "KPOINTS": KPOINTS,
+                "ELASTIC_TENSOR": "\n".join("  ".join(f"{x * 10:.4f}" for x in row) for row in stiffness),
+                "prop_data": {
+                    "stiffness_tensor": stiffness,
+                    "compliance_tensor": make_tensor(rng, 0.01),
+                    "Pugh_ratio": rng.uniform(0.5, 2),
+                    "Cauchy_Pressure": rng.uniform(-300, 100),
+                    "Kleinman_parameter": rng.uniform(0, 1),
+                    "Universal_Elastic_Anisotropy": rng.uniform(0, 2),
+                    "Chung_Buessem_Anisotropy": rng.uniform(0, 1),
+                    "Isotropic_Poissons_Ratio": rng.uniform(0, 0.5),
+                    "Longitudinal_wave_velocity": rng.uniform(5, 20),
+                    "Transverse_wave_velocity": rng.uniform(3, 15),
+                    "Average_wave_velocity": rng.uniform(3, 15),
+                    "Debye_temperature": rng.uniform(500, 2500),
+                    "stability": rng.random() > 0.1,
+                    "anisotropic_mechanical_properties": {"max_youngs_modulus": rng.uniform(100, 1200)},
+                    "average_mechanical_properties": {"bulk_modulus": rng.uniform(50, 450)},
+                    "average_youngs_modulus": rng.uniform(50, 1100),
+                },
+            },
+            "band": {
+                "band_gap": {
+                    "Band Character": rng.choice(["Direct", "Indirect"]),
+                    "Band Gap (eV)": gap,
+                    "Eigenvalue of VBM (eV)": -gap / 2,
+                    "Eigenvalue of CBM (eV)": gap / 2,
+                    "Fermi Energy (eV)": rng.uniform(-5, 5),
+                    "HOMO & LUMO Bands": [sites * 2, sites * 2 + 1],
+                    "Location of VBM": [0.0, 0.0, 0.0],
+                    "Location of CBM": [0.5, 0.0, 0.5],
+                },
+                "Klabels": {"G": 0.0, "X": 0.5, "M": 1.2, "R": 1.9},
+            },
+        },
+        "formula": f"C{sites}",
+        "reduced_formula": "C",
+        "crystal_system": crystal_system,
+        "space_group_symbol": rng.choice(CRYSTAL_SYSTEMS.get(crystal_system, ["P1"])),
+        "Sites": sites,
+    }
+    if with_id:
+        # 由 rng 生成而不是 ObjectId()（依赖时钟与进程），相同种子得到相同的数据集
+        doc["_id"] = ObjectId(rng.randbytes(12))
+    return doc
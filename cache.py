@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from config import config
+
+MISSING = object()
+
+
+class TTLCache:
+    """ 有容量上限与过期时间的 LRU 缓存，记录命中/未命中次数 """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, material_id: str):
+        """ 删除某个材料的全部 section 缓存（key 的第一个元素为 material_id） """
+        with self._lock:
+            for key in [k for k in self._data if isinstance(k, tuple) and k and k[0] == material_id]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# 按 (material_id, section) 缓存已构建好的响应数据
+material_cache = TTLCache(config.MATERIAL_CACHE_MAX_ENTRIES, config.MATERIAL_CACHE_TTL_SECONDS)
+
+
+def invalidate_material(material_id: str = None):
+    """ 供数据导入任务调用：material_id 为空时清空全部缓存 """
+    if material_id is None:
+        material_cache.clear()
+    else:
+        material_cache.invalidate(str(material_id))
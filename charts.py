@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from config import config
+from database import get_collection, get_collection_version
+from metrics import timed
+from responses import CachedBody, make_body
+from summary_index import get_summary_index
+
+# 在 MongoDB 端完成计数，只把各分组的计数传回来
+CHART_PIPELINE = [
+    {"$facet": {
+        "crystal_system": [
+            {"$group": {"_id": "$crystal_system", "count": {"$sum": 1}}},
+        ],
+        "space_group_symbol": [
+            {"$group": {"_id": "$space_group_symbol", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": 20},
+        ],
+        "Sites": [
+            {"$match": {"Sites": {"$type": "number"}}},
+            {"$group": {"_id": "$Sites", "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+        ],
+    }},
+]
+
+
+def render_charts(counts: dict) -> bytes:
+    """ 根据分组计数生成三个 Plotly 图，直接拼成序列化好的 JSON 字节 """
+    # plotly（会连带导入 pandas）只在真正渲染图表时才加载；numpy 已由摘要索引在启动时导入
+    import numpy as np
+    import plotly.express as px
+    import plotly.io as pio
+
+    # Plotly 的 to_json 使用 orjson 引擎
+    pio.json.config.default_engine = "orjson"
+
+    crystal = counts["crystal_system"]
+    crystal_pie = px.pie(names=[c["_id"] for c in crystal], values=[c["count"] for c in crystal],
+                         title="Distribution of Crystal Systems")
+
+    space_groups = counts["space_group_symbol"]
+    space_group_pie = px.pie(names=[c["_id"] for c in space_groups], values=[c["count"] for c in space_groups],
+                             title="Top 20 Space Group Symbols")
+
+    # 箱线图需要原始分布，按计数展开（只在数据变化时执行一次）
+    sites = counts["Sites"]
+    sites_values = np.repeat([c["_id"] for c in sites], [c["count"] for c in sites])
+    sites_hist = px.histogram(x=sites_values, nbins=10, title="Distribution of Materials by Sites",
+                              marginal="box", labels={"x": "Sites"})
+
+    return b"".join([
+        b'{"crystal_pie":', crystal_pie.to_json().encode("utf-8"),
+        b',"space_group_pie":', space_group_pie.to_json().encode("utf-8"),
+        b',"sites_hist":', sites_hist.to_json().encode("utf-8"),
+        b"}",
+    ])
+
+
+class ChartCache:
+    """ 缓存 /charts 的响应体（含 ETag，压缩版本由 cached_response 按编码缓存），集合版本变化时才重新聚合与渲染 """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self.body = None
+        self.version = None
+        self.checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> CachedBody:
+        if self.body is not None and time.monotonic() - self.checked_at < self.check_interval:
+            return self.body
+        async with self._lock:
+            if self.body is not None and time.monotonic() - self.checked_at < self.check_interval:
+                return self.body
+            # 内存摘要索引已加载时直接用它的计数与版本，否则在 MongoDB 中聚合
+            index = get_summary_index()
+            version = index.version if index is not None else await get_collection_version()
+            if self.body is None or version != self.version:
+                if index is not None:
+                    counts = index.chart_counts()
+                else:
+                    cursor = await get_collection().aggregate(CHART_PIPELINE)
+                    counts = (await cursor.to_list(None))[0]
+                with timed("plotly"):
+                    self.body = make_body(await run_in_threadpool(render_charts, counts))
+                self.version = version
+            self.checked_at = time.monotonic()
+            return self.body
+
+    def invalidate(self):
+        self.body = None
+
+
+chart_cache = ChartCache(config.CHARTS_VERSION_CHECK_SECONDS)
@@ -0,0 +1,89 @@
+"""
+CIF 文件的内容寻址存储：每个结构只用 pymatgen 渲染一次，按结构内容的 sha256 存放在 CIF_STORE_DIR 下。
+
+批量预生成：
+    python cif_store.py --workers 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from config import config
+from metrics import timed
+
+
+def structure_digest(structure_dict: dict) -> str:
+    """ 结构字典的内容哈希，同时用作文件名与 ETag """
+    payload = json.dumps(structure_dict, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cif_path(digest: str) -> str:
+    return os.path.join(config.CIF_STORE_DIR, digest[:2], f"{digest}.cif")
+
+
+def render_cif(structure_dict: dict) -> str:
+    # pymatgen 导入很慢，只在真正需要渲染时加载
+    from pymatgen.core import Structure
+    from pymatgen.io.cif import CifWriter
+
+    structure = Structure.from_dict(structure_dict)
+    return str(CifWriter(structure, significant_figures=6))
+
+
+def write_cif(structure_dict: dict, digest: str = None) -> str:
+    """ 渲染并写入存储（已存在则跳过），返回文件路径 """
+    digest = digest or structure_digest(structure_dict)
+    path = cif_path(digest)
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with timed("pymatgen"):
+        content = render_cif(structure_dict)
+    # 先写临时文件再原子替换，避免并发请求读到写了一半的文件；
+    # 临时文件名对每个写入方唯一，同一结构的并发写入（多个线程或进程）互不干扰
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def _write_one(structure_dict: dict) -> str:
+    try:
+        return write_cif(structure_dict)
+    except Exception as e:
+        return f"error: {e}"
+
+
+def build_all(workers: int = None, query: dict = None) -> int:
+    """ 用进程池为集合中的结构批量生成 CIF，返回处理的结构数 """
+    from pymongo import MongoClient
+
+    client = MongoClient(config.MONGO_URI)
+    collection = client[config.DB][config.COLLECTION]
+    cursor = collection.find(query or {"structure": {"$exists": True}}, {"structure": 1})
+    structures = (doc["structure"] for doc in cursor if doc.get("structure"))
+
+    count = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(_write_one, structures, chunksize=32):
+            count += 1
+            if result.startswith("error:"):
+                print(result)
+    client.close()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量生成 CIF 文件")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    print(f"rendered {build_all(args.workers)} structures into {config.CIF_STORE_DIR}")
@@ -0,0 +1,270 @@
+"""
+响应压缩：按 Accept-Encoding 协商 br / gzip（br 需要安装 brotli，未安装时只用 gzip）。
+
+- CompressionMiddleware 对动态响应按需压缩，小于阈值的不压缩，流式响应逐块压缩
+- 已缓存的响应体（CachedBody）每种编码只压缩一次，之后直接返回压缩后的字节
+- 磁盘上的静态文件 / CIF / 数据集快照预先压缩为同目录下的 .gz / .br 文件，源文件更新后自动重新生成
+
+提前批量预压缩：
+    python compression.py static cif_data dataset
+"""
+import argparse
+import importlib.util
+import os
+import tempfile
+import zlib
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse
+
+from cache import MISSING, TTLCache
+from config import config
+
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# 磁盘文件的预压缩只做一次且在线程池 / 离线执行，使用最高压缩级别
+PRECOMPRESS_GZIP_LEVEL = 9
+PRECOMPRESS_BROTLI_QUALITY = 11
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/x-ndjson", "application/javascript", "application/xml",
+    "image/svg+xml", "chemical/x-cif", "application/vnd.apache.arrow.file",
+)
+PRECOMPRESS_EXTENSIONS = (".csv", ".cif", ".json", ".html", ".txt", ".arrow")
+
+# 按配置顺序排列的可用编码，同等 q 值时靠前的优先
+AVAILABLE_ENCODINGS = [
+    coding.strip() for coding in config.COMPRESSION_ENCODINGS.split(",")
+    if coding.strip() in SUFFIXES and (coding.strip() != "br" or importlib.util.find_spec("brotli") is not None)
+]
+
+# (ETag, 编码) -> 压缩后的响应体；ETag 是内容哈希，不会过期失效
+_encoded_bodies = TTLCache(config.COMPRESSION_CACHE_MAX_ENTRIES, config.MATERIAL_CACHE_TTL_SECONDS)
+
+
+def accepted_codings(accept_encoding: str) -> dict:
+    """ 解析 Accept-Encoding，返回 编码 -> q 值 """
+    codings = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        params = params.replace(" ", "")
+        try:
+            codings[coding] = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            codings[coding] = 0.0
+    return codings
+
+
+def negotiate(accept_encoding: str):
+    """ 选出客户端接受且服务端可用的最佳编码，都不接受时返回 None """
+    if not config.COMPRESSION_ENABLED:
+        return None
+    codings = accepted_codings(accept_encoding)
+    best, best_q = None, 0.0
+    for coding in AVAILABLE_ENCODINGS:
+        q = codings.get(coding, codings.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def is_compressible(media_type: str) -> bool:
+    return bool(media_type) and media_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+def make_compressor(encoding: str, precompress: bool = False):
+    """ 返回 (compress, finish) 两个函数，用于流式压缩 """
+    if encoding == "br":
+        import brotli
+
+        quality = PRECOMPRESS_BROTLI_QUALITY if precompress else config.COMPRESSION_BROTLI_QUALITY
+        compressor = brotli.Compressor(quality=quality)
+        return compressor.process, compressor.finish
+    level = PRECOMPRESS_GZIP_LEVEL if precompress else config.COMPRESSION_GZIP_LEVEL
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def compress(data: bytes, encoding: str, precompress: bool = False) -> bytes:
+    compress_chunk, finish = make_compressor(encoding, precompress)
+    return compress_chunk(data) + finish()
+
+
+def weak_etag(etag: str) -> str:
+    # 压缩后的字节与原始表示不同，强 ETag 改为弱 ETag（is_not_modified 比较时会去掉 W/）
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+def add_vary(headers: MutableHeaders):
+    vary = headers.get("vary", "")
+    if "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+
+
+def encoded_body(body: bytes, etag: str, encoding: str) -> bytes:
+    """
+    已缓存响应体的压缩版本，每种编码只压缩一次。
+    在事件循环中同步执行，因此使用动态压缩级别（100 KB 约几毫秒），而不是预压缩的最高级别
+    """
+    key = (etag, encoding)
+    data = _encoded_bodies.get(key)
+    if data is MISSING:
+        data = compress(body, encoding)
+        _encoded_bodies.set(key, data)
+    return data
+
+
+def precompressed_path(path: str, encoding: str) -> str:
+    """ 返回最新的预压缩文件路径：不存在或比源文件旧时重新生成（先写临时文件再原子替换） """
+    target = path + SUFFIXES[encoding]
+    try:
+        if os.stat(target).st_mtime >= os.stat(path).st_mtime:
+            return target
+    except FileNotFoundError:
+        pass
+    with open(path, "rb") as f:
+        data = compress(f.read(), encoding, precompress=True)
+    # 在线程池中执行，同一文件可能被多个请求同时生成：每个写入方使用唯一的临时文件
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(target))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return target
+
+
+async def file_response(request, path: str, media_type: str, filename: str = None, headers: dict = None,
+                        stat_result: os.stat_result = None) -> FileResponse:
+    """
+    与 FileResponse 相同，但客户端接受压缩时直接返回预压缩文件。
+    带 Range 的请求始终返回原始文件，保证字节偏移对应未压缩的内容。
+    """
+    headers = dict(headers or {})
+    encoding = None
+    if is_compressible(media_type):
+        headers["Vary"] = "Accept-Encoding"
+        if "range" not in request.headers:
+            encoding = negotiate(request.headers.get("accept-encoding"))
+        size = stat_result.st_size if stat_result is not None else os.path.getsize(path)
+        if size < config.COMPRESSION_MIN_SIZE:
+            encoding = None
+    if encoding is None:
+        return FileResponse(path, filename=filename, media_type=media_type, headers=headers, stat_result=stat_result)
+    variant = await run_in_threadpool(precompressed_path, path, encoding)
+    headers["Content-Encoding"] = encoding
+    if "ETag" in headers:
+        headers["ETag"] = weak_etag(headers["ETag"])
+    return FileResponse(variant, filename=filename, media_type=media_type, headers=headers)
+
+
+class CompressionMiddleware:
+    """ ASGI 中间件：对未编码、可压缩且不小于阈值的响应按协商结果压缩；分块响应逐块压缩 """
+
+    def __init__(self, app, minimum_size: int = None):
+        self.app = app
+        self.minimum_size = config.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    def should_compress(self, status: int, headers: MutableHeaders, size) -> bool:
+        if status < 200 or status in (204, 206, 304):
+            return False
+        if "content-encoding" in headers or not is_compressible(headers.get("content-type")):
+            return False
+        return size is None or size >= self.minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = None if "range" in request_headers else negotiate(request_headers.get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compress_chunk = finish = None
+
+        async def send_wrapper(message):
+            nonlocal start_message, compress_chunk, finish
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                # 等到第一个响应体消息，知道响应大小后再决定是否压缩
+                start_message = message
+                return
+            if message_type != "http.response.body":
+                # 例如 http.response.pathsend：不压缩，原样发送
+                if start_message is not None:
+                    await send(start_message)
+                    start_message = None
+                await send(message)
+                return
+            if start_message is None:
+                # 后续的响应体块
+                if compress_chunk is not None:
+                    more_body = message.get("more_body", False)
+                    body = compress_chunk(message.get("body", b""))
+                    if not more_body:
+                        body += finish()
+                    message = {"type": "http.response.body", "body": body, "more_body": more_body}
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            content_length = headers.get("content-length")
+            size = len(body) if not more_body else int(content_length) if content_length else None
+            if not self.should_compress(start["status"], headers, size):
+                if is_compressible(headers.get("content-type")):
+                    add_vary(headers)
+                await send(start)
+                await send(message)
+                return
+
+            compress_chunk, finish = make_compressor(encoding)
+            headers["Content-Encoding"] = encoding
+            add_vary(headers)
+            if "etag" in headers:
+                headers["ETag"] = weak_etag(headers["etag"])
+            if more_body:
+                # 分块响应：总长度未知
+                if "content-length" in headers:
+                    del headers["content-length"]
+                body = compress_chunk(body)
+            else:
+                body = compress_chunk(body) + finish()
+                headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def precompress_tree(paths) -> int:
+    """ 为目录下的可压缩文件生成所有可用编码的预压缩版本，返回处理的文件数 """
+    count = 0
+    for root_path in paths:
+        for root, _, names in os.walk(root_path):
+            for name in names:
+                if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                if os.path.getsize(path) < config.COMPRESSION_MIN_SIZE:
+                    continue
+                for encoding in AVAILABLE_ENCODINGS:
+                    precompressed_path(path, encoding)
+                count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="预压缩静态文件")
+    parser.add_argument("paths", nargs="*", default=["static", config.CIF_STORE_DIR, config.DATASET_DIR])
+    args = parser.parse_args()
+    print(f"precompressed {precompress_tree(args.paths)} files ({', '.join(AVAILABLE_ENCODINGS)})")
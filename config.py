@@ -1,3 +1,6 @@
+from typing import Dict, Optional, Tuple
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 
@@ -6,9 +9,117 @@ class Settings(BaseSettings):
     DB: str
     COLLECTION: str
     USER_COLLECTION: str
+    META_COLLECTION: str = "meta"
+
+    # 异步 MongoDB 连接池 / 超时 / 读偏好
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_CONNECT_TIMEOUT_MS: int = 5000
+    MONGO_SOCKET_TIMEOUT_MS: int = 10000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_READ_PREFERENCE: str = "primaryPreferred"
+
+    # 密码哈希：执行器类型（thread / process）、并发数、排队上限与 bcrypt work factor
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+    BCRYPT_ROUNDS: int = 12
+
+    # 访问令牌：多 worker / 多实例部署时必须在 .env 中设置相同的 AUTH_SECRET_KEY；
+    # 未设置时每个进程随机生成（启动时打印警告），一个 worker 签发的令牌在其他 worker 上验证失败
+    AUTH_SECRET_KEY: Optional[str] = None
+    ACCESS_TOKEN_TTL_SECONDS: int = 15 * 60
+    REFRESH_TOKEN_TTL_SECONDS: int = 7 * 24 * 3600
+    TOKEN_REVOCATION_MAX_ENTRIES: int = 100000
+    TOKEN_VERIFY_CACHE_SIZE: int = 10000
+    TOKEN_VERIFY_CACHE_TTL_SECONDS: float = 60
+    AUTH_REQUIRED_FOR_MATERIALS: bool = False
+
+    # 采样 profiler：默认关闭，开启后可通过 /metrics/profiler/* 接口启停
+    PROFILER_ENABLED: bool = False
+    PROFILER_INTERVAL_SECONDS: float = 0.005
+
+    # 单个材料查询结果的进程内缓存
+    MATERIAL_CACHE_MAX_ENTRIES: int = 4096
+    MATERIAL_CACHE_TTL_SECONDS: float = 3600
+    # 信任数据库中的材料数据：跳过 Pydantic 校验直接序列化原始文档（输出会包含模型之外的字段）
+    TRUST_DB_DATA: bool = False
+    # 单个材料接口响应的 Cache-Control，配合 ETag 让浏览器 / CDN 复用；
+    # 未设置时为 public，开启 AUTH_REQUIRED_FOR_MATERIALS 时为 private，避免共享缓存把需要令牌的响应返回给其他人
+    MATERIAL_CACHE_CONTROL: Optional[str] = None
+
+    # 预生成 CIF 文件的存储目录（按内容哈希寻址）
+    CIF_STORE_DIR: str = "cif_data"
+
+    # /materials_summary 分页
+    SUMMARY_DEFAULT_PAGE_SIZE: int = 10
+    SUMMARY_MAX_PAGE_SIZE: int = 200
+    SUMMARY_COUNT_TTL_SECONDS: float = 60
+
+    # /materials/batch 单次请求的最大 id 数
+    BATCH_MAX_IDS: int = 100
+    # /materials/mechanics 单次请求的最大 id 数（只取刚度矩阵，可以比 batch 大得多）
+    MECHANICS_MAX_IDS: int = 1000
+
+    # /materials 流式导出时每批从游标读取的文档数
+    EXPORT_BATCH_SIZE: int = 200
+
+    # BDOS 预览页面的下载超时与磁盘缓存
+    BDOS_FETCH_TIMEOUT_SECONDS: float = 30
+    BDOS_CACHE_DIR: str = "bdos_cache"
+    BDOS_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    BDOS_CACHE_TTL_SECONDS: float = 24 * 3600
+
+    # 摘要字段的内存列式索引
+    SUMMARY_INDEX_ENABLED: bool = True
+    # 后台检查集合版本戳的间隔：变化时重建摘要索引并清空材料缓存
+    COLLECTION_VERSION_CHECK_SECONDS: float = 60
+
+    # 批量导入：/download 提供的摘要 CSV、每批 bulk_write 的文档数、空间群判定的对称性容差
+    CSV_EXPORT_PATH: str = "static/et_carbon.csv"
+    INGEST_BATCH_SIZE: int = 1000
+    INGEST_SYMPREC: float = 0.1
+
+    # 结构相似度搜索：指纹矩阵目录、k 的上限、交给 StructureMatcher 重排的候选数为 k 的几倍
+    FINGERPRINT_DIR: str = "fingerprints"
+    SIMILAR_MAX_K: int = 50
+    SIMILAR_SHORTLIST_FACTOR: int = 3
+
+    # Parquet / Arrow 数据集快照目录，以及检查集合版本的最小间隔
+    DATASET_DIR: str = "dataset"
+    DATASET_VERSION_CHECK_SECONDS: float = 30
+
+    # 响应压缩：按顺序协商的编码（br 需要安装 brotli）、最小压缩字节数与动态压缩级别
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_ENCODINGS: str = "br,gzip"
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    # 已缓存响应体的压缩版本：(ETag, 编码) 条目数上限，每个材料响应最多两种编码，与材料缓存分开设置
+    COMPRESSION_CACHE_MAX_ENTRIES: int = 8192
+
+    # 昂贵接口的准入控制：路由模板 -> (并发上限, 排队上限, 排队超时秒数)；可在 .env 中以 JSON 覆盖
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LIMITS: Dict[str, Tuple[int, int, float]] = {
+        "/api/charts": (2, 32, 10),
+        "/api/materials": (2, 4, 5),
+        "/api/download/{material_id}": (4, 32, 10),
+        "/api/get_bdos_url/{material_id}": (8, 32, 15),
+        "/api/material/{material_id}/similar": (4, 16, 10),
+    }
+
+    # /charts 缓存检查集合版本的最小间隔
+    CHARTS_VERSION_CHECK_SECONDS: float = 30
 
     class Config:
         env_file = ".env"
 
+    @model_validator(mode="after")
+    def _default_cache_control(self):
+        if self.MATERIAL_CACHE_CONTROL is None:
+            visibility = "private" if self.AUTH_REQUIRED_FOR_MATERIALS else "public"
+            self.MATERIAL_CACHE_CONTROL = f"{visibility}, max-age=3600"
+        return self
+
 
 config = Settings()
@@ -1,6 +1,57 @@
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient
 from config import config
-client = MongoClient(config.MONGO_URI)
-db = client[config.DB]
-collection = db[config.COLLECTION]
-users_collection = db[config.USER_COLLECTION]  # 存储用户信息的 Collection
+from metrics import mongo_listener
+
+# 异步客户端在 FastAPI lifespan 中创建（connect），导入本模块时不建立任何连接；
+# 脚本等未经过 lifespan 的场景在首次访问集合时自动创建
+_client = None
+
+
+def connect() -> AsyncMongoClient:
+    global _client
+    if _client is None:
+        _client = AsyncMongoClient(
+            config.MONGO_URI,
+            maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+            minPoolSize=config.MONGO_MIN_POOL_SIZE,
+            connectTimeoutMS=config.MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=config.MONGO_SOCKET_TIMEOUT_MS,
+            serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            readPreference=config.MONGO_READ_PREFERENCE,
+            event_listeners=[mongo_listener],  # 记录每条命令的耗时
+        )
+    return _client
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def get_db():
+    return connect()[config.DB]
+
+
+def get_collection():
+    return get_db()[config.COLLECTION]
+
+
+def get_users_collection():
+    return get_db()[config.USER_COLLECTION]  # 存储用户信息的 Collection
+
+
+def get_meta_collection():
+    return get_db()[config.META_COLLECTION]  # 记录各集合的版本戳
+
+
+async def get_collection_version():
+    """ 材料集合的版本戳：导入任务写入后递增 meta 中的 version；同时带上文档数，未记录版本时也能感知增删 """
+    stamp = await get_meta_collection().find_one({"_id": config.COLLECTION}, {"version": 1})
+    count = await get_collection().estimated_document_count()
+    return (stamp or {}).get("version", 0), count
+
+
+async def bump_collection_version():
+    await get_meta_collection().update_one({"_id": config.COLLECTION}, {"$inc": {"version": 1}}, upsert=True)
@@ -0,0 +1,257 @@
+"""
+从材料集合直接生成列式数据集快照（Parquet 与 Arrow IPC），包含摘要字段以及展开后的带隙、弹性性质列，
+只按列投影读取所需字段。集合版本变化时只读取上次快照之后新增的文档（_id 递增）并追加；
+文档数对不上（有删除）时退回全量生成。原地修改已有文档后需手动全量重建：
+
+    python dataset.py --full
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Literal
+
+from bson import ObjectId
+from starlette.concurrency import run_in_threadpool
+
+from config import config
+from database import get_collection, get_collection_version
+from metrics import timed
+from search import BAND_GAP_FIELD, YOUNGS_MODULUS_FIELD
+from sections import get_path
+
+BAND_GAP_PATH = "metadata.band.band_gap"
+PROP_DATA_PATH = "metadata.elastic.prop_data"
+ELASTIC_SCALARS = (
+    "Pugh_ratio", "Cauchy_Pressure", "Kleinman_parameter", "Universal_Elastic_Anisotropy",
+    "Chung_Buessem_Anisotropy", "Isotropic_Poissons_Ratio", "Longitudinal_wave_velocity",
+    "Transverse_wave_velocity", "Average_wave_velocity", "Debye_temperature",
+)
+
+# (列名, 文档中的路径, Arrow 类型)
+DATASET_COLUMNS = [
+    ("_id", "_id", "string"),
+    ("sacada_id", "sacada_id", "string"),
+    ("formula", "formula", "string"),
+    ("reduced_formula", "reduced_formula", "string"),
+    ("crystal_system", "crystal_system", "string"),
+    ("space_group_symbol", "space_group_symbol", "string"),
+    ("Sites", "Sites", "int32"),
+    ("band_character", f"{BAND_GAP_PATH}.Band Character", "string"),
+    ("band_gap", BAND_GAP_FIELD, "float64"),
+    ("vbm", f"{BAND_GAP_PATH}.Eigenvalue of VBM (eV)", "float64"),
+    ("cbm", f"{BAND_GAP_PATH}.Eigenvalue of CBM (eV)", "float64"),
+    ("fermi_energy", f"{BAND_GAP_PATH}.Fermi Energy (eV)", "float64"),
+    ("average_youngs_modulus", YOUNGS_MODULUS_FIELD, "float64"),
+    ("max_youngs_modulus", f"{PROP_DATA_PATH}.anisotropic_mechanical_properties.max_youngs_modulus", "float64"),
+    ("bulk_modulus", f"{PROP_DATA_PATH}.average_mechanical_properties.bulk_modulus", "float64"),
+    ("stability", f"{PROP_DATA_PATH}.stability", "bool"),
+] + [(name, f"{PROP_DATA_PATH}.{name}", "float64") for name in ELASTIC_SCALARS]
+
+COLUMN_NAMES = [name for name, _, _ in DATASET_COLUMNS]
+DATASET_PROJECTION = {path: 1 for _, path, _ in DATASET_COLUMNS}
+DatasetFormat = Literal["parquet", "arrow"]
+DATASET_FILES = {"parquet": "carbon_materials.parquet", "arrow": "carbon_materials.arrow"}
+MEDIA_TYPES = {"parquet": "application/vnd.apache.parquet", "arrow": "application/vnd.apache.arrow.file"}
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 上没有 flock，只有进程内的 asyncio.Lock（开发环境通常是单 worker）
+    fcntl = None
+
+
+def dataset_path(fmt: str) -> str:
+    return os.path.join(config.DATASET_DIR, DATASET_FILES[fmt])
+
+
+def _coerce(value, type_name: str):
+    """ 类型不符的值记为 null，避免个别脏数据让整列的类型推断失败 """
+    if value is None:
+        return None
+    if type_name == "string":
+        return str(value)
+    if type_name == "bool":
+        return value if isinstance(value, bool) else None
+    if isinstance(value, bool):
+        return None
+    if type_name == "int32":
+        return value if isinstance(value, int) else None
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+def dataset_schema():
+    import pyarrow as pa
+
+    return pa.schema([(name, getattr(pa, type_name)()) for name, _, type_name in DATASET_COLUMNS])
+
+
+def docs_to_table(docs: list):
+    import pyarrow as pa
+
+    columns = {name: [_coerce(get_path(doc, path), type_name) for doc in docs]
+               for name, path, type_name in DATASET_COLUMNS}
+    return pa.Table.from_pydict(columns, schema=dataset_schema())
+
+
+def read_manifest():
+    try:
+        with open(os.path.join(config.DATASET_DIR, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _temp_path(path: str) -> str:
+    """ 目标文件同目录下的唯一临时文件名，并发写入方不会写到同一个文件 """
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path))
+    os.close(fd)
+    return tmp_path
+
+
+def _write_manifest(manifest: dict):
+    path = os.path.join(config.DATASET_DIR, MANIFEST_FILE)
+    tmp_path = _temp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+class SnapshotLock:
+    """
+    跨进程互斥：DATASET_DIR 下锁文件上的 fcntl.flock，同一台机器上的多个 worker 不会同时重建快照。
+    以非阻塞方式轮询，等待期间不占用线程池线程，请求被取消时也不会遗留锁。
+    """
+
+    def __init__(self, directory: str, poll_interval: float = 0.1):
+        self.path = os.path.join(directory, LOCK_FILE)
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    async def __aenter__(self):
+        if fcntl is None:
+            return self
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(self.poll_interval)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+def build_snapshot(docs: list, version: list, incremental: bool = False) -> dict:
+    """ 写入 Parquet 与 Arrow 快照（先写临时文件再原子替换），manifest 最后更新；incremental 时追加到已有快照 """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    previous = read_manifest() if incremental else None
+    if previous is not None and not docs:
+        # 版本变化但没有新增文档（例如回填了不导出的字段），快照无需重写
+        previous["version"] = version
+        _write_manifest(previous)
+        return previous
+
+    table = docs_to_table(docs)
+    if previous is not None:
+        # Arrow IPC 文件可直接内存映射读取，追加时不需要解析旧快照
+        with pa.memory_map(dataset_path("arrow")) as source:
+            table = pa.concat_tables([pa.ipc.open_file(source).read_all(), table])
+
+    os.makedirs(config.DATASET_DIR, exist_ok=True)
+    parquet_path, arrow_path = dataset_path("parquet"), dataset_path("arrow")
+    parquet_tmp, arrow_tmp = _temp_path(parquet_path), _temp_path(arrow_path)
+    try:
+        pq.write_table(table, parquet_tmp, compression="zstd")
+        # Arrow 文件不压缩，客户端可以零拷贝内存映射
+        feather.write_feather(table, arrow_tmp, compression="uncompressed")
+        os.replace(parquet_tmp, parquet_path)
+        os.replace(arrow_tmp, arrow_path)
+    finally:
+        for tmp_path in (parquet_tmp, arrow_tmp):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    manifest = {
+        "version": version,
+        "rows": table.num_rows,
+        "last_id": table["_id"][-1].as_py() if table.num_rows else None,
+        "columns": COLUMN_NAMES,
+        "generated_at": time.time(),
+    }
+    _write_manifest(manifest)
+    return manifest
+
+
+class DatasetExporter:
+    """
+    按集合版本维护磁盘上的快照。进程内由 asyncio.Lock、进程间由 SnapshotLock 保证同一时间只有一方重建；
+    拿到锁后重新读取 manifest，其他 worker 刚重建完成时直接使用。文件先写唯一的临时文件再原子替换。
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self.checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self, manifest) -> bool:
+        return manifest is not None and time.monotonic() - self.checked_at < self.check_interval
+
+    async def ensure_current(self, full: bool = False) -> dict:
+        manifest = read_manifest()
+        if not full and self._fresh(manifest):
+            return manifest
+        async with self._lock:
+            manifest = read_manifest()
+            if not full and self._fresh(manifest):
+                return manifest
+            async with SnapshotLock(config.DATASET_DIR):
+                manifest = read_manifest()
+                version = list(await get_collection_version())
+                if full or manifest is None or manifest["version"] != version:
+                    manifest = await self.regenerate(None if full else manifest, version)
+            self.checked_at = time.monotonic()
+            return manifest
+
+    async def regenerate(self, manifest, version: list) -> dict:
+        incremental = (manifest is not None and manifest.get("columns") == COLUMN_NAMES
+                       and os.path.exists(dataset_path("arrow")))
+        query = {}
+        if incremental and manifest.get("last_id"):
+            query = {"_id": {"$gt": ObjectId(manifest["last_id"])}}
+        docs = await get_collection().find(query, DATASET_PROJECTION).sort("_id", 1).to_list(None)
+        # 文档数对不上说明有删除，退回全量生成
+        if incremental and manifest["rows"] + len(docs) != version[1]:
+            incremental = False
+            docs = await get_collection().find({}, DATASET_PROJECTION).sort("_id", 1).to_list(None)
+        with timed("dataset"):
+            return await run_in_threadpool(build_snapshot, docs, version, incremental)
+
+
+dataset_exporter = DatasetExporter(config.DATASET_VERSION_CHECK_SECONDS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成 Parquet / Arrow 数据集快照")
+    parser.add_argument("--full", action="store_true", help="忽略已有快照，全量重建")
+    args = parser.parse_args()
+    result = asyncio.run(dataset_exporter.ensure_current(full=args.full))
+    print(f"{result['rows']} rows written to {config.DATASET_DIR}")
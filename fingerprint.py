@@ -0,0 +1,259 @@
+"""
+结构相似度搜索：离线为每个结构计算定长指纹（周期性径向分布函数 + 原子数密度），存为可 memmap 的 NumPy 矩阵；
+查询时在矩阵上向量化求 top-k 最近邻，只对候选短名单用 pymatgen StructureMatcher 重排。
+
+离线构建（导入新结构后重新运行；服务检测到文件变化会自动重新加载）：
+    python fingerprint.py --workers 8
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from bson import ObjectId
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from cache import MISSING, material_cache
+from config import config
+from database import get_collection
+from metrics import timed
+from sections import SECTION_FIELDS, fetch_section
+from summary_index import get_summary_index
+
+logger = logging.getLogger(__name__)
+
+RDF_CUTOFF = 6.0  # Å
+RDF_BINS = 60
+# 数密度（约 0.1–0.2 个原子/Å³）放大到与 g(r) 单个分箱相近的量级
+DENSITY_WEIGHT = 10.0
+FINGERPRINT_LENGTH = RDF_BINS + 1
+_SMOOTHING = np.exp(-0.5 * np.arange(-3, 4) ** 2)
+_SMOOTHING /= _SMOOTHING.sum()
+
+MATRIX_FILE = "fingerprints.npy"
+IDS_FILE = "ids.json"
+
+
+def structure_fingerprint(structure_dict: dict) -> np.ndarray:
+    """ 由 pymatgen Structure 字典直接计算指纹，不需要导入 pymatgen """
+    lattice = np.asarray(structure_dict["lattice"]["matrix"], dtype=float)
+    cart = np.asarray([site["abc"] for site in structure_dict["sites"]], dtype=float) @ lattice
+    n = len(cart)
+    density = n / abs(np.linalg.det(lattice))
+
+    # 每个方向需要的周期像数 = 截断半径 / 晶面间距（倒格矢长度的倒数）
+    spacing = 1 / np.linalg.norm(np.linalg.inv(lattice), axis=0)
+    reps = np.ceil(RDF_CUTOFF / spacing).astype(int)
+    grid = np.stack(np.meshgrid(*(np.arange(-r, r + 1) for r in reps), indexing="ij"), axis=-1).reshape(-1, 3)
+    images = (cart[None, :, :] + (grid @ lattice)[:, None, :]).reshape(-1, 3)
+
+    edges = np.linspace(0, RDF_CUTOFF, RDF_BINS + 1)
+    counts = np.zeros(RDF_BINS)
+    for center in cart:
+        distances = np.linalg.norm(images - center, axis=1)
+        counts += np.histogram(distances[(distances > 1e-6) & (distances <= RDF_CUTOFF)], bins=edges)[0]
+    shells = 4 / 3 * np.pi * (edges[1:] ** 3 - edges[:-1] ** 3)
+    rdf = np.convolve(counts / (n * density * shells), _SMOOTHING, mode="same")
+    return np.append(rdf, density * DENSITY_WEIGHT).astype(np.float32)
+
+
+class FingerprintIndex:
+    def __init__(self, matrix: np.ndarray, ids: list, version=None, mtime=None):
+        self.matrix = matrix
+        self.ids = ids
+        self.version = version
+        self.mtime = mtime
+        self.row_of = {material_id: row for row, material_id in enumerate(ids)}
+        # 预先计算每行的平方范数，查询时 |x - q|² = |x|² - 2x·q + |q|² 只需一次矩阵向量乘
+        self.sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, directory: str, mtime=None):
+        with open(os.path.join(directory, IDS_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        # 旧版本写出的 ids.json 没有 matrix 字段，矩阵固定为 MATRIX_FILE
+        matrix = np.load(os.path.join(directory, meta.get("matrix", MATRIX_FILE)), mmap_mode="r")
+        if matrix.shape != (len(meta["ids"]), FINGERPRINT_LENGTH):
+            raise ValueError(f"fingerprint matrix shape {matrix.shape} does not match {len(meta['ids'])} ids")
+        return cls(matrix, meta["ids"], meta.get("version"), mtime)
+
+    def nearest(self, vector: np.ndarray, count: int, exclude: int = None):
+        """ 返回距离最近的 count 行及其欧氏距离（升序） """
+        distances = self.sq_norms - 2 * (self.matrix @ vector) + vector @ vector
+        if exclude is not None:
+            distances[exclude] = np.inf
+        count = min(count, len(distances) - (exclude is not None))
+        if count <= 0:
+            return np.empty(0, dtype=int), np.empty(0)
+        rows = np.argpartition(distances, count - 1)[:count]
+        rows = rows[np.argsort(distances[rows])]
+        return rows, np.sqrt(np.maximum(distances[rows], 0))
+
+
+_current = None
+
+
+def get_fingerprint_index():
+    """ 按 ids.json 的修改时间懒加载；离线任务重建后下一次请求自动切换，文件不存在时返回 None """
+    global _current
+    try:
+        mtime = os.stat(os.path.join(config.FINGERPRINT_DIR, IDS_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _current is None or _current.mtime != mtime:
+        try:
+            _current = FingerprintIndex.load(config.FINGERPRINT_DIR, mtime)
+        except (OSError, ValueError) as e:
+            # 读到 ids.json 之后矩阵已被下一次重建删除等情况，继续使用旧索引
+            logger.warning("Failed to load fingerprint index: %s", e)
+    return _current
+
+
+def match_structures(reference: dict, candidates: list) -> list:
+    """ 逐个计算候选与参考结构的 StructureMatcher rms 距离，不等价时为 None """
+    from pymatgen.analysis.structure_matcher import StructureMatcher
+    from pymatgen.core import Structure
+
+    matcher = StructureMatcher()
+    reference = Structure.from_dict(reference)
+    results = []
+    with timed("pymatgen"):
+        for candidate in candidates:
+            rms = matcher.get_rms_dist(reference, Structure.from_dict(candidate)) if candidate else None
+            results.append(round(float(rms[0]), 6) if rms is not None else None)
+    return results
+
+
+async def find_similar(material_id: str, k: int, rerank: bool = True) -> list:
+    index = get_fingerprint_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="Fingerprint index has not been built")
+    key = (material_id, "similar", k, rerank, index.mtime)
+    cached = material_cache.get(key)
+    if cached is not MISSING:
+        return cached
+
+    row = index.row_of.get(material_id)
+    structure = None
+    if row is None or rerank:
+        structure = (await fetch_section(material_id, "structure")).get("structure")
+        if not structure:
+            raise HTTPException(status_code=404, detail="Material has no structure")
+    # 索引构建之后才导入的材料现场计算指纹（CPU 密集，放到线程池），候选仍来自索引
+    if row is not None:
+        vector = np.asarray(index.matrix[row])
+    else:
+        vector = await run_in_threadpool(structure_fingerprint, structure)
+
+    shortlist = k * config.SIMILAR_SHORTLIST_FACTOR if rerank else k
+    rows, distances = index.nearest(vector, shortlist, exclude=row)
+    results = [{"_id": index.ids[r], "fingerprint_distance": round(float(d), 6)} for r, d in zip(rows, distances)]
+    if rerank and results:
+        docs = await get_collection().find({"_id": {"$in": [ObjectId(r["_id"]) for r in results]}},
+                                           {"structure": 1}).to_list(None)
+        structures = {str(doc["_id"]): doc.get("structure") for doc in docs}
+        rms = await run_in_threadpool(match_structures, structure, [structures.get(r["_id"]) for r in results])
+        for result, value in zip(results, rms):
+            result["rms_dist"] = value
+        # StructureMatcher 判定等价的排在前面（按 rms），其余保持指纹距离顺序
+        results.sort(key=lambda r: (r["rms_dist"] is None, r["rms_dist"] or 0, r["fingerprint_distance"]))
+    results = results[:k]
+
+    summary = get_summary_index()
+    if summary is not None:
+        for result in results:
+            result.update(summary.get(result["_id"]) or {})
+    elif results:
+        projection = dict.fromkeys(SECTION_FIELDS["basicprop"], 1)
+        docs = await get_collection().find({"_id": {"$in": [ObjectId(r["_id"]) for r in results]}},
+                                           projection).to_list(None)
+        fields = {str(doc.pop("_id")): doc for doc in docs}
+        for result in results:
+            result.update(fields.get(result["_id"], {}))
+    material_cache.set(key, results)
+    return results
+
+
+def _fingerprint_one(item):
+    material_id, structure_dict = item
+    try:
+        return material_id, structure_fingerprint(structure_dict)
+    except Exception as e:
+        print(f"{material_id}: {type(e).__name__}: {e}")
+        return material_id, None
+
+
+def write_index(directory: str, ids: list, matrix: np.ndarray, version=None):
+    """
+    矩阵写入新的唯一文件名，ids.json 记录该文件名并最后原子替换：读者先读 ids.json 再按其中的文件名打开矩阵，
+    总是得到配套的一对。服务以 ids.json 的修改时间判断是否重新加载；被替换的旧矩阵随后删除。
+    """
+    os.makedirs(directory, exist_ok=True)
+    ids_path = os.path.join(directory, IDS_FILE)
+    previous_matrix = _matrix_file(directory)
+    fd, matrix_path = tempfile.mkstemp(prefix="fingerprints-", suffix=".npy", dir=directory)
+    fd_ids, ids_tmp = tempfile.mkstemp(prefix=f"{IDS_FILE}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, matrix.astype(np.float32))
+        with os.fdopen(fd_ids, "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "version": version, "length": FINGERPRINT_LENGTH,
+                       "matrix": os.path.basename(matrix_path)}, f)
+        os.replace(ids_tmp, ids_path)
+    except BaseException:
+        for path in (matrix_path, ids_tmp):
+            if os.path.exists(path):
+                os.unlink(path)
+        raise
+    # 已经 memmap 旧矩阵的进程不受影响；刚读到旧 ids.json 的进程加载失败后继续用旧索引，下次请求再读新的
+    if previous_matrix is not None and previous_matrix != os.path.basename(matrix_path):
+        try:
+            os.unlink(os.path.join(directory, previous_matrix))
+        except FileNotFoundError:
+            pass
+
+
+def _matrix_file(directory: str):
+    """ 当前 ids.json 指向的矩阵文件名；旧格式没有记录时为 MATRIX_FILE，尚未构建时为 None """
+    try:
+        with open(os.path.join(directory, IDS_FILE), encoding="utf-8") as f:
+            return json.load(f).get("matrix", MATRIX_FILE)
+    except (OSError, ValueError):
+        return None
+
+
+def build_index(workers: int = None) -> int:
+    """ 用进程池计算集合中所有结构的指纹并写入 FINGERPRINT_DIR，返回写入的行数 """
+    from pymongo import MongoClient
+
+    client = MongoClient(config.MONGO_URI)
+    db = client[config.DB]
+    meta = db[config.META_COLLECTION].find_one({"_id": config.COLLECTION}) or {}
+    cursor = db[config.COLLECTION].find({"structure": {"$exists": True}}, {"structure": 1}).sort("_id", 1)
+    items = ((str(doc["_id"]), doc["structure"]) for doc in cursor if doc.get("structure"))
+
+    ids, vectors = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for material_id, vector in pool.map(_fingerprint_one, items, chunksize=32):
+            if vector is not None:
+                ids.append(material_id)
+                vectors.append(vector)
+    client.close()
+
+    matrix = np.vstack(vectors) if vectors else np.empty((0, FINGERPRINT_LENGTH), dtype=np.float32)
+    write_index(config.FINGERPRINT_DIR, ids, matrix, meta.get("version", 0))
+    return len(ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="构建结构指纹矩阵")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    print(f"wrote {build_index(args.workers)} fingerprints into {config.FINGERPRINT_DIR}")
@@ -0,0 +1,170 @@
+"""
+材料集合与用户集合的索引定义：应用启动时创建；也可以单独检查搜索查询的执行计划。
+
+    python indexes.py --check
+"""
+import argparse
+import asyncio
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from config import config
+from database import get_collection, get_users_collection
+from pagination import SORT_FIELDS
+from search import BAND_GAP_FIELD, SEARCH_PROJECTION, YOUNGS_MODULUS_FIELD, build_search_filter
+
+# /materials/search 的 ESR 索引：等值字段在前，其后是排序键 _id，最后是范围字段。
+# _id 紧跟等值前缀，索引顺序即 keyset 分页的顺序，不需要内存排序；范围条件在索引键上过滤。
+# 每种等值组合一个索引，查询时按过滤条件选择并 hint，见 search_index_name
+SEARCH_RANGE_FIELDS = ["Sites", BAND_GAP_FIELD, YOUNGS_MODULUS_FIELD]
+SEARCH_INDEX_PREFIXES = [
+    ("search_crystal_system_space_group", ["crystal_system", "space_group_symbol"]),
+    ("search_crystal_system", ["crystal_system"]),
+    ("search_space_group", ["space_group_symbol"]),
+    ("search_reduced_formula", ["reduced_formula"]),
+    # 只有范围条件：按 _id 顺序扫描索引，在索引键上过滤
+    ("search_ranges", []),
+]
+
+MATERIAL_INDEXES = [
+    IndexModel([(field, ASCENDING) for field in equality + ["_id"] + SEARCH_RANGE_FIELDS], name=name)
+    for name, equality in SEARCH_INDEX_PREFIXES
+] + [
+    # 批量导入按结构内容哈希去重；旧文档没有该字段，用部分索引避免它们互相冲突
+    IndexModel([("structure_digest", ASCENDING)], name="structure_digest_unique", unique=True,
+               partialFilterExpression={"structure_digest": {"$exists": True}}),
+] + [
+    # 单字段等值过滤以及 /materials_summary 的 keyset 分页排序 (field, _id)
+    IndexModel([(field, ASCENDING), ("_id", ASCENDING)], name=f"{field}_id")
+    for field in SORT_FIELDS if field != "_id"
+]
+
+USER_INDEXES = [
+    # 邮箱唯一，注册时直接插入并依赖唯一索引判断重复
+    IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    # 登录只按 email 查 password_hash（投影排除 _id），由该索引覆盖，无需读取文档
+    IndexModel([("email", ASCENDING), ("password_hash", ASCENDING)], name="email_password_hash"),
+]
+
+# 用于执行计划检查的代表性查询及其应当使用的索引，每种过滤条件至少出现一次
+SAMPLE_SEARCHES = [
+    ({"crystal_system": "cubic"}, "search_crystal_system"),
+    ({"crystal_system": "cubic", "space_group_symbol": "Fd-3m"}, "search_crystal_system_space_group"),
+    ({"crystal_system": "cubic", "space_group_symbol": "Fd-3m", "sites_min": 4, "sites_max": 16},
+     "search_crystal_system_space_group"),
+    ({"space_group_symbol": "P6_3/mmc"}, "search_space_group"),
+    ({"reduced_formula": "C"}, "search_reduced_formula"),
+    ({"sites_min": 8, "sites_max": 24}, "search_ranges"),
+    ({"band_gap_min": 1.0, "band_gap_max": 5.0}, "search_ranges"),
+    ({"youngs_modulus_min": 500}, "search_ranges"),
+    ({"crystal_system": "hexagonal", "band_gap_min": 0.5}, "search_crystal_system"),
+]
+
+# ensure_material_indexes 成功后才 hint，索引缺失时 hint 会让查询直接报错
+_search_indexes_ready = False
+
+
+def search_index_name(query: dict) -> str:
+    """ 按过滤条件中出现的等值字段选择 ESR 索引 """
+    for name, equality in SEARCH_INDEX_PREFIXES:
+        if all(field in query for field in equality):
+            return name
+
+
+def find_search_page(query: dict, limit: int, after: dict = None):
+    """ /materials/search 的查询：按 _id 升序取 limit 条，after 为 keyset 条件；--check 解释的也是这个游标 """
+    predicate = {"$and": [query, after]} if after else query
+    cursor = get_collection().find(predicate, SEARCH_PROJECTION).sort("_id", ASCENDING).limit(limit)
+    if _search_indexes_ready:
+        cursor = cursor.hint(search_index_name(query))
+    return cursor
+
+
+async def find_duplicate_emails(limit: int = 10) -> list:
+    """ 用户集合中出现多次的 email（唯一索引建立之前的并发注册可能留下重复） """
+    pipeline = [
+        {"$group": {"_id": "$email", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit},
+    ]
+    cursor = await get_users_collection().aggregate(pipeline)
+    return [doc["_id"] async for doc in cursor]
+
+
+async def ensure_user_indexes():
+    """ 注册依赖 email 唯一索引判断重复，建立失败时抛出异常，由调用方决定是否继续启动 """
+    try:
+        await get_users_collection().create_indexes(USER_INDEXES)
+    except DuplicateKeyError:
+        duplicates = await find_duplicate_emails()
+        raise RuntimeError(f"Cannot create the unique email index, merge or remove duplicate users first: "
+                           f"{', '.join(map(str, duplicates))}")
+
+
+async def ensure_material_indexes():
+    global _search_indexes_ready
+    await get_collection().create_indexes(MATERIAL_INDEXES)
+    _search_indexes_ready = True
+
+
+async def ensure_indexes():
+    await ensure_user_indexes()
+    await ensure_material_indexes()
+
+
+def plan_nodes(plan: dict):
+    """ 递归列出执行计划中的所有节点 """
+    yield plan
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from plan_nodes(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from plan_nodes(child)
+
+
+def plan_problem(winning_plan: dict, expected_index: str):
+    """ 胜出计划应只扫描 expected_index，没有 COLLSCAN 和内存排序；返回问题描述，没有问题时返回 None """
+    nodes = list(plan_nodes(winning_plan))
+    stages = [node["stage"] for node in nodes if "stage" in node]
+    index_names = [node.get("indexName") for node in nodes if node.get("stage") == "IXSCAN"]
+    if "COLLSCAN" in stages:
+        return "COLLSCAN"
+    if any(stage.startswith("SORT") for stage in stages):
+        return "in-memory SORT"
+    if index_names != [expected_index]:
+        return f"scans {index_names or 'no index'}, expected {expected_index}"
+    return None
+
+
+async def check_search_plans(page_size: int = config.SUMMARY_DEFAULT_PAGE_SIZE) -> list:
+    """ 解释每个示例查询实际使用的游标，返回 (参数, 问题) 列表，正常情况下应为空列表 """
+    failures = []
+    for params, expected_index in SAMPLE_SEARCHES:
+        cursor = find_search_page(build_search_filter(**params), page_size + 1)
+        try:
+            explain = await cursor.explain()
+        except OperationFailure as e:
+            failures.append((params, f"explain failed: {e}"))
+            continue
+        problem = plan_problem(explain["queryPlanner"]["winningPlan"], expected_index)
+        if problem is not None:
+            failures.append((params, problem))
+    return failures
+
+
+async def _main(check: bool):
+    await ensure_indexes()
+    if check:
+        failures = await check_search_plans()
+        for params, problem in failures:
+            print(f"{problem}: {params}")
+        if failures:
+            raise SystemExit(1)
+        print(f"{len(SAMPLE_SEARCHES)} search plans use their ESR index without an in-memory sort")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="创建索引并检查搜索查询的执行计划")
+    parser.add_argument("--check", action="store_true")
+    asyncio.run(_main(parser.parse_args().check))
@@ -0,0 +1,153 @@
+"""
+批量导入新结构：扫描目录中的 CIF / POSCAR / CONTCAR / *.vasp / vasprun.xml，用进程池并行解析，
+计算 formula、reduced_formula、crystal_system、space_group_symbol、Sites 后以无序 bulk_write 分批写入。
+按结构内容哈希去重，重复运行只会写入新结构；写入后增量追加摘要 CSV、预生成 CIF，并递增集合版本，
+让运行中的服务重新加载摘要索引、清空材料缓存与 /charts。
+
+    python ingest.py data/new_batch/ more/POSCAR --workers 8
+"""
+import argparse
+import csv
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from cif_store import structure_digest, write_cif
+from config import config
+from indexes import MATERIAL_INDEXES
+
+STRUCTURE_SUFFIXES = (".cif", ".vasp", ".poscar")
+STRUCTURE_PREFIXES = ("POSCAR", "CONTCAR")
+CSV_FIELDS = ("_id", "formula", "crystal_system", "space_group_symbol", "Sites")
+
+
+def is_structure_file(name: str) -> bool:
+    return (name.lower().endswith(STRUCTURE_SUFFIXES) or name.startswith(STRUCTURE_PREFIXES)
+            or name in ("vasprun.xml", "vasprun.xml.gz"))
+
+
+def discover(paths) -> list:
+    """ 展开目录，返回排序后的结构文件列表（保证多次运行顺序一致） """
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        for root, _, names in os.walk(path):
+            files.extend(os.path.join(root, name) for name in names if is_structure_file(name))
+    return sorted(files)
+
+
+def parse_structure_file(path: str, symprec: float, write_cif_file: bool = True) -> dict:
+    """ 在工作进程中解析单个文件并计算派生字段；失败时返回 {"path", "error"} 而不是抛出 """
+    # pymatgen 导入很慢，只在工作进程中加载
+    from pymatgen.core import Structure
+    from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+
+    try:
+        structure = Structure.from_file(path)
+        analyzer = SpacegroupAnalyzer(structure, symprec=symprec)
+        # 经一次 JSON 往返，保证字典只含 BSON 可存的类型，且与从 MongoDB 读回时的哈希一致
+        structure_dict = json.loads(json.dumps(structure.as_dict()))
+        digest = structure_digest(structure_dict)
+        if write_cif_file:
+            write_cif(structure_dict, digest)
+        composition = structure.composition
+        return {
+            "structure": structure_dict,
+            "structure_digest": digest,
+            "formula": composition.formula.replace(" ", ""),
+            "reduced_formula": composition.reduced_formula,
+            "crystal_system": analyzer.get_crystal_system(),
+            "space_group_symbol": analyzer.get_space_group_symbol(),
+            "Sites": len(structure),
+            "source_file": os.path.abspath(path),
+        }
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+
+
+def write_batch(collection, docs: list, stats: Counter) -> list:
+    """ 以结构哈希为键做无序 upsert，返回新插入文档的 CSV 行 """
+    from pymongo import UpdateOne
+    from pymongo.errors import BulkWriteError
+
+    ops = [UpdateOne({"structure_digest": doc["structure_digest"]}, {"$setOnInsert": doc}, upsert=True)
+           for doc in docs]
+    try:
+        result = collection.bulk_write(ops, ordered=False)
+        upserted = result.upserted_ids
+        stats["existing"] += result.matched_count
+    except BulkWriteError as e:
+        # 无序写入时其余操作照常完成；并发导入同一结构会产生唯一索引冲突，按已存在处理
+        details = e.details
+        upserted = {item["index"]: item["_id"] for item in details.get("upserted", [])}
+        stats["existing"] += details.get("nMatched", 0)
+        for error in details.get("writeErrors", []):
+            if error.get("code") == 11000:
+                stats["existing"] += 1
+            else:
+                stats["errors"] += 1
+                print(f"write error: {error.get('errmsg')}")
+    stats["inserted"] += len(upserted)
+    return [[str(_id)] + [docs[index][field] for field in CSV_FIELDS[1:]] for index, _id in sorted(upserted.items())]
+
+
+def append_csv_rows(path: str, rows: list):
+    """ 只追加新行，不重写已有导出 """
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(CSV_FIELDS)
+        writer.writerows(rows)
+
+
+def ingest(paths, workers: int = None, batch_size: int = None, write_cifs: bool = True) -> Counter:
+    from pymongo import MongoClient
+
+    batch_size = batch_size or config.INGEST_BATCH_SIZE
+    files = discover(paths)
+    client = MongoClient(config.MONGO_URI)
+    db = client[config.DB]
+    collection = db[config.COLLECTION]
+    # 去重依赖 structure_digest 唯一索引，服务可能尚未启动过，这里先确保索引存在
+    collection.create_indexes(MATERIAL_INDEXES)
+
+    stats = Counter(files=len(files))
+    new_rows = []
+    batch = []
+    parse = partial(parse_structure_file, symprec=config.INGEST_SYMPREC, write_cif_file=write_cifs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map 会一次性提交所有任务，写库期间工作进程继续解析
+        for doc in pool.map(parse, files, chunksize=16):
+            if "error" in doc:
+                stats["parse_errors"] += 1
+                print(f"{doc['path']}: {doc['error']}")
+                continue
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                new_rows += write_batch(collection, batch, stats)
+                batch = []
+                print(f"{stats['inserted']} inserted, {stats['existing']} already present")
+        if batch:
+            new_rows += write_batch(collection, batch, stats)
+
+    if new_rows:
+        append_csv_rows(config.CSV_EXPORT_PATH, new_rows)
+        # 与 database.bump_collection_version 相同
+        db[config.META_COLLECTION].update_one({"_id": config.COLLECTION}, {"$inc": {"version": 1}}, upsert=True)
+    client.close()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量导入结构文件")
+    parser.add_argument("paths", nargs="+", help="结构文件或目录")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--no-cif", action="store_true", help="不预生成 CIF 文件")
+    args = parser.parse_args()
+    print(json.dumps(ingest(args.paths, args.workers, args.batch_size, not args.no_cif), indent=2))
@@ -1,12 +1,76 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from starlette.staticfiles import StaticFiles
 
-from routes import auth, signup, materials
+import database
+from admission import AdmissionMiddleware
+from bdos import close_client as close_bdos_client
+from compression import CompressionMiddleware
+from config import config
+from indexes import ensure_material_indexes, ensure_user_indexes
+from passwords import password_hasher
+from metrics import MetricsMiddleware
+from routes import auth, signup, materials, metrics
+from summary_index import load_summary_index, refresh_summary_index
+from tokens import SECRET_IS_EPHEMERAL, materials_guard
+from version_watch import watch_collection_version_forever
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if SECRET_IS_EPHEMERAL:
+        logger.warning("AUTH_SECRET_KEY is not set: using a random per-process key. Tokens issued by this worker "
+                       "will be rejected by other workers and after a restart; set AUTH_SECRET_KEY in .env")
+
+    # 在 lifespan 中创建 MongoDB 客户端，而不是在导入模块时
+    database.connect()
+
+    # 注册只靠 email 唯一索引判断重复，索引建不起来时不能接受注册，直接启动失败
+    await ensure_user_indexes()
+    # 启动时确保搜索与分页所需的索引存在（已存在时为空操作）；缺少时只影响性能
+    try:
+        await ensure_material_indexes()
+    except Exception as e:
+        logger.warning("Failed to create indexes: %s", e)
 
-app = FastAPI()
+    # 加载摘要字段的内存索引
+    refreshers = []
+    if config.SUMMARY_INDEX_ENABLED:
+        try:
+            await load_summary_index()
+        except Exception as e:
+            logger.warning("Failed to load summary index: %s", e)
+        refreshers.append(refresh_summary_index)
+    # 集合版本变化时刷新摘要索引并清空材料缓存；不启用摘要索引时也要运行
+    watch_task = asyncio.create_task(
+        watch_collection_version_forever(config.COLLECTION_VERSION_CHECK_SECONDS, refreshers))
+
+    yield
+
+    watch_task.cancel()
+    await close_bdos_client()
+    password_hasher.shutdown()
+    await database.close()
+
+
+# 默认使用 orjson 编码 JSON 响应
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # 允许前端跨域访问
+# 按路由统计请求耗时
+app.add_middleware(MetricsMiddleware)
+# 按 Accept-Encoding 压缩动态响应（已缓存的响应体与磁盘文件使用预压缩版本，不经过这里重复压缩）
+app.add_middleware(CompressionMiddleware)
+# 昂贵接口按路由限制并发与排队，过载时快速返回 429 / 503
+app.add_middleware(AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # 生产环境需指定域名
@@ -17,7 +81,8 @@ app.add_middleware(
 
 app.include_router(auth.router, prefix="/auth")
 app.include_router(signup.router, prefix="/signup")
-app.include_router(materials.router, prefix="/api")
+app.include_router(materials.router, prefix="/api", dependencies=[Depends(materials_guard)])
+app.include_router(metrics.router)
 # 挂载静态文件目录
 # app.mount("/cif_files", StaticFiles(directory="cif_data"), name="cif_files")
 
@@ -0,0 +1,221 @@
+"""
+请求级性能指标：按路由统计延迟直方图、MongoDB 命令耗时（pymongo CommandListener）、
+各处理阶段（Pydantic / pymatgen / Plotly / bcrypt）耗时以及缓存命中率，以 Prometheus 文本格式输出。
+另提供可选的采样 profiler，用于定位热点。
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+from admission import admission_metric_lines
+from cache import material_cache
+from config import config
+
+# 以秒为单位的直方图分桶
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """ 按标签分组的累计直方图 """
+
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple = BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def expose(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(counts), count, total) for labels, (counts, count, total) in self._series.items()]
+        for labels, counts, count, total in sorted(items):
+            label_text = ",".join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            prefix = label_text + "," if label_text else ""
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+            lines.append(f"{self.name}_sum{{{label_text}}} {total:.6f}")
+        return lines
+
+
+request_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route",
+                             ("method", "route", "status"))
+mongo_command_duration = Histogram("mongodb_command_duration_seconds", "MongoDB command latency",
+                                   ("command", "outcome"))
+stage_duration = Histogram("app_stage_duration_seconds", "Time spent in expensive processing stages", ("stage",))
+
+
+@contextmanager
+def timed(stage: str):
+    """ 统计某个处理阶段的耗时，例如 with timed("pymatgen"): ... """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe((stage,), time.perf_counter() - start)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_duration.observe((event.command_name, "success"), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        mongo_command_duration.observe((event.command_name, "failure"), event.duration_micros / 1e6)
+
+
+mongo_listener = MongoCommandListener()
+
+
+class MetricsMiddleware:
+    """ ASGI 中间件：记录每个请求的耗时，按路由模板（而不是具体路径）分组，避免标签基数爆炸 """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            request_duration.observe((scope["method"], route_path, str(status)), time.perf_counter() - start)
+
+
+class SamplingProfiler:
+    """ 定时采样事件循环线程的调用栈，输出 collapsed stack 格式（可直接用 flamegraph 工具绘制） """
+
+    def __init__(self, interval: float, max_stacks: int = 5000):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.stacks = Counter()
+        self.samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._target_thread_id = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, target_thread_id: int):
+        if self.running:
+            return
+        self._target_thread_id = target_thread_id
+        self._stop.clear()
+        self.stacks.clear()
+        self.samples = 0
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            if key in self.stacks or len(self.stacks) < self.max_stacks:
+                self.stacks[key] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+profiler = SamplingProfiler(config.PROFILER_INTERVAL_SECONDS)
+
+
+def render_metrics() -> str:
+    """ 生成 Prometheus 文本格式的全部指标 """
+    lines = []
+    for histogram in (request_duration, mongo_command_duration, stage_duration):
+        lines.extend(histogram.expose())
+
+    stats = material_cache.stats()
+    lines += [
+        "# HELP material_cache_hits_total Material section cache hits",
+        "# TYPE material_cache_hits_total counter",
+        f"material_cache_hits_total {stats['hits']}",
+        "# HELP material_cache_misses_total Material section cache misses",
+        "# TYPE material_cache_misses_total counter",
+        f"material_cache_misses_total {stats['misses']}",
+        "# HELP material_cache_evictions_total Material section cache evictions",
+        "# TYPE material_cache_evictions_total counter",
+        f"material_cache_evictions_total {stats['evictions']}",
+        "# HELP material_cache_entries Material section cache size",
+        "# TYPE material_cache_entries gauge",
+        f"material_cache_entries {stats['entries']}",
+        "# HELP material_cache_hit_ratio Material section cache hit ratio",
+        "# TYPE material_cache_hit_ratio gauge",
+        f"material_cache_hit_ratio {stats['hit_rate']:.4f}",
+    ]
+    lines += admission_metric_lines()
+    lines += process_memory_lines()
+    return "\n".join(lines) + "\n"
+
+
+def process_memory_lines() -> list:
+    """ 进程当前与峰值常驻内存 """
+    import resource
+
+    lines = [
+        "# HELP process_max_resident_memory_bytes Peak resident memory",
+        "# TYPE process_max_resident_memory_bytes gauge",
+        # Linux 上 ru_maxrss 以 KB 为单位
+        f"process_max_resident_memory_bytes {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}",
+    ]
+    try:
+        with open("/proc/self/statm") as f:
+            rss_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return lines
+    lines += [
+        "# HELP process_resident_memory_bytes Resident memory",
+        "# TYPE process_resident_memory_bytes gauge",
+        f"process_resident_memory_bytes {rss_pages * resource.getpagesize()}",
+    ]
+    return lines
@@ -0,0 +1,216 @@
+"""
+弹性张量与能带数据的数值表示：6×6 刚度 / 柔度矩阵、带边能量和 Klabels 以 little-endian float64
+打包为 BSON Binary，存放在文档的 numeric 字段中，客户端不再需要解析文本或 repr 字符串。
+
+- 尚未回填的文档从 metadata 中的原始字段现场转换，接口行为一致
+- derived_mechanics 对 (n, 6, 6) 的刚度矩阵批量计算 Voigt / Reuss / Hill 模量等力学量
+
+回填已有文档：
+    python numeric.py --backfill
+"""
+import argparse
+
+import numpy as np
+from bson import Binary
+
+from config import config
+from sections import SECTION_FIELDS, get_path
+
+NUMERIC_FIELD = "numeric"
+DTYPE = np.dtype("<f8")
+TENSOR_SHAPE = (6, 6)
+BAND_EDGE_FIELDS = {
+    "vbm": "Eigenvalue of VBM (eV)",
+    "cbm": "Eigenvalue of CBM (eV)",
+    "band_gap": "Band Gap (eV)",
+    "fermi_energy": "Fermi Energy (eV)",
+}
+# 二进制响应：按此顺序拼接的 float64 记录，缺失部分为 NaN；Klabels 只在 JSON 中返回
+RECORD_LAYOUT = (("stiffness", 36), ("compliance", 36), ("band_edges", len(BAND_EDGE_FIELDS)))
+RECORD_LENGTH = sum(size for _, size in RECORD_LAYOUT)
+RECORD_LAYOUT_HEADER = ",".join(f"{name}:{size}" for name, size in RECORD_LAYOUT)
+
+# 回填与现场转换时需要读取的原始字段
+LEGACY_FIELDS = SECTION_FIELDS["numeric_legacy"]
+LEGACY_STIFFNESS_FIELD = "metadata.elastic.prop_data.stiffness_tensor"
+
+
+def _as_tensor(value):
+    try:
+        tensor = np.asarray(value, dtype=DTYPE)
+    except (TypeError, ValueError):
+        return None
+    return tensor if tensor.shape == TENSOR_SHAPE else None
+
+
+def _as_float(value) -> float:
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+def arrays_from_legacy(doc: dict) -> dict:
+    """ 从 metadata 中的列表 / 字典字段构造数值数组，缺失或形状不对的部分跳过 """
+    arrays = {}
+    prop_data = get_path(doc, "metadata.elastic.prop_data", {})
+    if isinstance(prop_data, dict):
+        for name, key in (("stiffness", "stiffness_tensor"), ("compliance", "compliance_tensor")):
+            tensor = _as_tensor(prop_data.get(key))
+            if tensor is not None:
+                arrays[name] = tensor
+    band_gap = get_path(doc, "metadata.band.band_gap")
+    if isinstance(band_gap, dict):
+        arrays["band_edges"] = np.array([_as_float(band_gap.get(key)) for key in BAND_EDGE_FIELDS.values()],
+                                        dtype=DTYPE)
+    klabels = get_path(doc, "metadata.band.Klabels")
+    if isinstance(klabels, dict) and klabels:
+        arrays["klabel_names"] = list(klabels)
+        arrays["klabel_positions"] = np.array([_as_float(v) for v in klabels.values()], dtype=DTYPE)
+    return arrays
+
+
+def pack_arrays(arrays: dict) -> dict:
+    """ 数值数组 -> 写入 MongoDB 的 numeric 子文档 """
+    packed = {name: Binary(arrays[name].astype(DTYPE).tobytes())
+              for name in ("stiffness", "compliance", "band_edges") if name in arrays}
+    if "klabel_names" in arrays:
+        packed["klabels"] = {"names": arrays["klabel_names"],
+                             "positions": Binary(arrays["klabel_positions"].astype(DTYPE).tobytes())}
+    return packed
+
+
+def unpack_arrays(packed: dict) -> dict:
+    arrays = {}
+    for name, shape in (("stiffness", TENSOR_SHAPE), ("compliance", TENSOR_SHAPE),
+                        ("band_edges", (len(BAND_EDGE_FIELDS),))):
+        if name in packed:
+            arrays[name] = np.frombuffer(packed[name], dtype=DTYPE).reshape(shape)
+    klabels = packed.get("klabels")
+    if klabels:
+        arrays["klabel_names"] = klabels["names"]
+        arrays["klabel_positions"] = np.frombuffer(klabels["positions"], dtype=DTYPE)
+    return arrays
+
+
+def load_arrays(doc: dict) -> dict:
+    """ 优先使用已打包的 numeric 字段，否则从原始字段转换 """
+    packed = doc.get(NUMERIC_FIELD)
+    return unpack_arrays(packed) if packed else arrays_from_legacy(doc)
+
+
+def _finite_or_none(value: float):
+    return float(value) if np.isfinite(value) else None
+
+
+def arrays_to_json(arrays: dict) -> dict:
+    band_edges = arrays.get("band_edges")
+    return {
+        "stiffness": arrays["stiffness"].tolist() if "stiffness" in arrays else None,
+        "compliance": arrays["compliance"].tolist() if "compliance" in arrays else None,
+        "band_edges": (None if band_edges is None else
+                       {name: _finite_or_none(value) for name, value in zip(BAND_EDGE_FIELDS, band_edges)}),
+        "klabels": (dict(zip(arrays["klabel_names"], arrays["klabel_positions"].tolist()))
+                    if "klabel_names" in arrays else None),
+    }
+
+
+def arrays_to_record(arrays: dict) -> bytes:
+    record = np.full(RECORD_LENGTH, np.nan, dtype=DTYPE)
+    offset = 0
+    for name, size in RECORD_LAYOUT:
+        if name in arrays:
+            record[offset:offset + size] = arrays[name].ravel()
+        offset += size
+    return record.tobytes()
+
+
+def derived_mechanics(stiffness: np.ndarray) -> dict:
+    """
+    对 (n, 6, 6) 的刚度矩阵（GPa）批量计算 Voigt / Reuss / Hill 体积与剪切模量、杨氏模量、泊松比、
+    Pugh 比和通用各向异性指数。柔度矩阵由刚度矩阵求逆得到，保证单位一致；
+    非正定（力学不稳定）的矩阵不求逆，依赖 Reuss 平均的量为 NaN。
+    """
+    C = stiffness
+    eigenvalues = np.linalg.eigvalsh((C + C.transpose(0, 2, 1)) / 2)
+    stable = eigenvalues[:, 0] > 0
+    S = np.full_like(C, np.nan)
+    if stable.any():
+        S[stable] = np.linalg.inv(C[stable])
+
+    def invariants(M):
+        # (C11 + C22 + C33, C12 + C23 + C13, C44 + C55 + C66)
+        return (np.trace(M[:, :3, :3], axis1=1, axis2=2), M[:, 0, 1] + M[:, 1, 2] + M[:, 0, 2],
+                np.trace(M[:, 3:, 3:], axis1=1, axis2=2))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c_a, c_b, c_c = invariants(C)
+        s_a, s_b, s_c = invariants(S)
+        bulk_voigt = (c_a + 2 * c_b) / 9
+        shear_voigt = (c_a - c_b + 3 * c_c) / 15
+        bulk_reuss = 1 / (s_a + 2 * s_b)
+        shear_reuss = 15 / (4 * s_a - 4 * s_b + 3 * s_c)
+        bulk_hill = (bulk_voigt + bulk_reuss) / 2
+        shear_hill = (shear_voigt + shear_reuss) / 2
+        return {
+            "stable": stable,
+            "bulk_modulus_voigt": bulk_voigt,
+            "bulk_modulus_reuss": bulk_reuss,
+            "bulk_modulus_hill": bulk_hill,
+            "shear_modulus_voigt": shear_voigt,
+            "shear_modulus_reuss": shear_reuss,
+            "shear_modulus_hill": shear_hill,
+            "youngs_modulus": 9 * bulk_hill * shear_hill / (3 * bulk_hill + shear_hill),
+            "poissons_ratio": (3 * bulk_hill - 2 * shear_hill) / (2 * (3 * bulk_hill + shear_hill)),
+            "pugh_ratio": bulk_hill / shear_hill,
+            "universal_anisotropy": 5 * shear_voigt / shear_reuss + bulk_voigt / bulk_reuss - 6,
+        }
+
+
+def mechanics_rows(material_ids: list, tensors: list) -> dict:
+    """ derived_mechanics 的按材料展开版本，NaN 输出为 None """
+    if not tensors:
+        return {}
+    mechanics = derived_mechanics(np.stack(tensors).astype(DTYPE))
+    rows = {}
+    for i, material_id in enumerate(material_ids):
+        row = {"stable": bool(mechanics["stable"][i])}
+        for name, values in mechanics.items():
+            if name != "stable":
+                row[name] = _finite_or_none(round(float(values[i]), 6))
+        rows[material_id] = row
+    return rows
+
+
+def backfill(force: bool = False) -> int:
+    """ 为集合中的文档写入 numeric 字段，返回更新的文档数 """
+    from pymongo import MongoClient, UpdateOne
+
+    client = MongoClient(config.MONGO_URI)
+    db = client[config.DB]
+    collection = db[config.COLLECTION]
+    query = {} if force else {NUMERIC_FIELD: {"$exists": False}}
+    cursor = collection.find(query, dict.fromkeys(LEGACY_FIELDS, 1), batch_size=config.INGEST_BATCH_SIZE)
+
+    updated = 0
+    ops = []
+    for doc in cursor:
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {NUMERIC_FIELD: pack_arrays(arrays_from_legacy(doc))}}))
+        if len(ops) >= config.INGEST_BATCH_SIZE:
+            updated += collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += collection.bulk_write(ops, ordered=False).modified_count
+    if updated:
+        # 与 database.bump_collection_version 相同：让服务清空缓存的响应
+        db[config.META_COLLECTION].update_one({"_id": config.COLLECTION}, {"$inc": {"version": 1}}, upsert=True)
+    client.close()
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回填弹性张量与能带数据的数值数组")
+    parser.add_argument("--backfill", action="store_true")
+    parser.add_argument("--force", action="store_true", help="重写已有的 numeric 字段")
+    args = parser.parse_args()
+    if args.backfill:
+        print(f"packed numeric arrays for {backfill(args.force)} documents")
+    else:
+        parser.print_help()
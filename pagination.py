@@ -0,0 +1,76 @@
+import base64
+import json
+import time
+from typing import Literal, get_args
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from config import config
+from database import get_collection
+
+# 允许作为分页排序键的字段，均以 _id 作为并列时的次序
+# 作为查询参数类型时由 FastAPI 校验，其他字段名返回 422，不会进入排序与过滤条件
+SortField = Literal["_id", "formula", "reduced_formula", "crystal_system", "space_group_symbol", "Sites"]
+SORT_FIELDS = get_args(SortField)
+
+
+def encode_cursor(sort_field: str, doc: dict) -> str:
+    """ 用最后一条记录的排序值和 _id 生成不透明的 next token """
+    payload = {"s": sort_field, "id": str(doc["_id"])}
+    if sort_field != "_id":
+        payload["v"] = doc.get(sort_field)
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, sort_field: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        last_id = ObjectId(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if payload.get("s") != sort_field:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort field")
+    return {"id": last_id, "v": payload.get("v")}
+
+
+def keyset_filter(sort_field: str, token: str) -> dict:
+    """ 根据 token 生成 "排在上一页最后一条之后" 的查询条件 """
+    if not token:
+        return {}
+    last = decode_cursor(token, sort_field)
+    if sort_field == "_id":
+        return {"_id": {"$gt": last["id"]}}
+    if last["v"] is None:
+        # null 在 MongoDB 排序中最小，后面是同为 null 的剩余记录以及所有非 null 记录
+        return {"$or": [{sort_field: None, "_id": {"$gt": last["id"]}}, {sort_field: {"$ne": None}}]}
+    return {"$or": [
+        {sort_field: {"$gt": last["v"]}},
+        {sort_field: last["v"], "_id": {"$gt": last["id"]}},
+    ]}
+
+
+def sort_spec(sort_field: str):
+    if sort_field == "_id":
+        return [("_id", 1)]
+    return [(sort_field, 1), ("_id", 1)]
+
+
+class CountCache:
+    """ 缓存集合总数，使用基于元数据的 estimated_document_count 而不是每次 count_documents """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.value = None
+        self.fetched_at = 0.0
+
+    async def get(self) -> int:
+        if self.value is None or time.monotonic() - self.fetched_at > self.ttl_seconds:
+            self.value = await get_collection().estimated_document_count()
+            self.fetched_at = time.monotonic()
+        return self.value
+
+
+total_count = CountCache(config.SUMMARY_COUNT_TTL_SECONDS)
@@ -0,0 +1,82 @@
+"""
+bcrypt 哈希 / 校验放到独立的线程池或进程池中执行，避免占用事件循环线程。
+排队中的任务数有上限，超过时直接返回 429，而不是让请求无限堆积。
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+from fastapi import HTTPException
+
+from config import config
+from metrics import timed
+
+
+def _hashpw(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _checkpw(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+def hash_rounds(hashed: bytes) -> int:
+    """ 从 $2b$12$... 形式的哈希中取出 work factor """
+    try:
+        return int(hashed.split(b"$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+class PasswordHasher:
+    def __init__(self, executor: str, workers: int, queue_size: int, rounds: int):
+        self.executor_kind = executor
+        self.workers = workers
+        self.rounds = rounds
+        # 正在执行与排队的任务总数上限
+        self._slots = asyncio.Semaphore(workers + queue_size)
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    @property
+    def busy(self) -> bool:
+        """ 执行与排队名额都已占满，此时提交的任务会被拒绝（429） """
+        return self._slots.locked()
+
+    async def _run(self, func, *args):
+        if self.busy:
+            raise HTTPException(status_code=429, detail="Too many authentication requests, please retry later",
+                                headers={"Retry-After": "1"})
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            with timed("bcrypt"):
+                return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def hash(self, password: str) -> bytes:
+        return await self._run(_hashpw, password.encode("utf-8"), self.rounds)
+
+    async def verify(self, password: str, hashed) -> bool:
+        if isinstance(hashed, str):
+            hashed = hashed.encode("utf-8")
+        return await self._run(_checkpw, password.encode("utf-8"), hashed)
+
+    def needs_rehash(self, hashed) -> bool:
+        if isinstance(hashed, str):
+            hashed = hashed.encode("utf-8")
+        return hash_rounds(hashed) < self.rounds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(config.PASSWORD_HASH_EXECUTOR, config.PASSWORD_HASH_WORKERS,
+                                 config.PASSWORD_HASH_QUEUE_SIZE, config.BCRYPT_ROUNDS)
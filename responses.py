@@ -0,0 +1,77 @@
+"""
+预先序列化的响应体：每个 (material, endpoint) 只做一次 Pydantic 校验与 JSON 编码，
+之后直接返回缓存的字节，并带上内容哈希 ETag，客户端 If-None-Match 命中时返回 304。
+"""
+import hashlib
+from email.utils import parsedate_to_datetime
+from typing import NamedTuple
+
+import orjson
+from fastapi import Request
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from compression import encoded_body, is_compressible, negotiate, weak_etag
+from config import config
+
+JSON = "application/json"
+PLAIN_TEXT = "text/plain; charset=utf-8"
+OCTET_STREAM = "application/octet-stream"
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+    media_type: str
+
+
+def orjson_default(obj):
+    """ orjson 不支持的类型：Pydantic 模型按别名导出，ObjectId 等其余类型转为字符串 """
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json", by_alias=True)
+    return str(obj)
+
+
+def make_body(content, media_type: str = JSON) -> CachedBody:
+    if isinstance(content, bytes):
+        body = content
+    elif isinstance(content, str):
+        body = content.encode("utf-8")
+    elif isinstance(content, BaseModel):
+        # 与 FastAPI 按 response_model 输出时一致：使用字段别名
+        body = content.model_dump_json(by_alias=True).encode("utf-8")
+    else:
+        body = orjson.dumps(content, default=orjson_default)
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    return CachedBody(body, etag, media_type)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: float = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags or "*" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cached_response(request: Request, cached: CachedBody, cache_control: str = None) -> Response:
+    """ 返回缓存的响应体；客户端接受压缩且超过阈值时返回每种编码只压缩一次的字节 """
+    headers = {"ETag": cached.etag, "Cache-Control": cache_control or config.MATERIAL_CACHE_CONTROL}
+    compressible = is_compressible(cached.media_type)
+    if compressible:
+        headers["Vary"] = "Accept-Encoding"
+    if is_not_modified(request, cached.etag):
+        return Response(status_code=304, headers=headers)
+    body = cached.body
+    encoding = negotiate(request.headers.get("accept-encoding")) if compressible else None
+    if encoding is not None and len(body) >= config.COMPRESSION_MIN_SIZE:
+        body = encoded_body(body, cached.etag, encoding)
+        headers["ETag"] = weak_etag(cached.etag)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=cached.media_type, headers=headers)
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, EmailStr
-from database import users_collection
-import bcrypt
+from database import get_users_collection
+from passwords import password_hasher
+from tokens import decode_token, issue_token_pair, require_token, revoke_token
 
 router = APIRouter()
 
@@ -11,15 +14,45 @@ class LoginRequest(BaseModel):
     password: str
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+
 @router.post("/login")
 async def login(request: LoginRequest):
-    # 查找用户
-    user = users_collection.find_one({"email": request.email})
+    # 查找用户（只取 password_hash，避免传回其它用户字段）
+    user = await get_users_collection().find_one({"email": request.email}, {"_id": 0, "password_hash": 1})
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials, please turn to signup page and first register")
 
-    # 验证密码
-    if not bcrypt.checkpw(request.password.encode("utf-8"), user["password_hash"]):
+    # 验证密码（在 bcrypt 线程池中执行）
+    if not await password_hasher.verify(request.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="The password is not correct! Please check your password!")
 
-    return {"message": "Login successful"}
+    # work factor 低于当前配置时顺带升级哈希；密码已经验证通过，线程池满时跳过升级，不让登录失败
+    if password_hasher.needs_rehash(user["password_hash"]) and not password_hasher.busy:
+        new_hash = await password_hasher.hash(request.password)
+        await get_users_collection().update_one({"email": request.email}, {"$set": {"password_hash": new_hash}})
+
+    # 签发访问令牌，之后的请求携带令牌即可，无需再次校验密码
+    return {"message": "Login successful", **issue_token_pair(request.email)}
+
+
+@router.post("/refresh")
+async def refresh(request: RefreshRequest):
+    # 刷新令牌只能使用一次，换发新的一对令牌
+    claims = decode_token(request.refresh_token, token_type="refresh")
+    revoke_token(claims)
+    return issue_token_pair(claims["sub"])
+
+
+@router.post("/logout")
+async def logout(request: LogoutRequest = None, claims: dict = Depends(require_token)):
+    revoke_token(claims)
+    if request and request.refresh_token:
+        revoke_token(decode_token(request.refresh_token, token_type="refresh"))
+    return {"message": "Logout successful"}
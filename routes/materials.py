@@ -1,22 +1,32 @@
-import gzip
-import json
 import os
-import shutil
-import tempfile
-
-import requests
-from fastapi import APIRouter, HTTPException, FastAPI, Query
-from pymatgen.core import Structure
-from pymatgen.io.cif import CifWriter
-from starlette.responses import PlainTextResponse, HTMLResponse
-
-from database import collection
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from email.utils import formatdate
+
+from fastapi import APIRouter, HTTPException, FastAPI, Query, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+
+from admission import inflight
+from bdos import accepts_gzip, gunzip_chunks, open_bdos
+from charts import chart_cache
+from cif_store import cif_path, structure_digest, write_cif
+from compression import file_response
+from config import config
+from database import get_collection
+from dataset import DATASET_FILES, MEDIA_TYPES, DatasetFormat, dataset_exporter, dataset_path
+from fingerprint import find_similar
+from indexes import find_search_page
+from pagination import SortField, decode_cursor, encode_cursor, keyset_filter, sort_spec, total_count
+from search import SEARCH_PROJECTION, build_search_filter, flatten_search_result
+from numeric import (LEGACY_STIFFNESS_FIELD, NUMERIC_FIELD, RECORD_LAYOUT_HEADER, arrays_to_json, arrays_to_record,
+                     load_arrays, mechanics_rows)
+from responses import JSON, OCTET_STREAM, PLAIN_TEXT, cached_response, is_not_modified, make_body
+from sections import (get_path, load_section, load_section_body, load_sections_batch, paths_projection,
+                      section_projection)
+from streaming import gzip_chunks, iter_json_array, iter_ndjson
+from summary_index import get_summary_index
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import List, Dict, Any, Literal, Optional
 from bson import ObjectId
-import pandas as pd
-from fastapi.responses import FileResponse
-from pymatgen.io.cif import CifParser
 
 router = APIRouter()
 
@@ -114,56 +124,66 @@ class MaterialSummary(BaseModel):
     Sites: Optional[int] = None
 
 
-@router.get("/material/{material_id}", response_model=MaterialData)
-async def get_material_by_id(material_id: str):
-    # 查询 MongoDB（假设 collection 已定义）
-    object_id = ObjectId(material_id)
-    doc = collection.find_one({"_id": object_id})
-    if doc:
-        # 将 _id 转为字符串，如果 _id 为 {"$oid": "..."} 则提取内部字符串
-        if isinstance(doc.get("_id"), dict) and "$oid" in doc["_id"]:
-            doc["_id"] = doc["_id"]["$oid"]
-        else:
-            doc["_id"] = str(doc["_id"])
-        # 使用 Pydantic 的 parse_obj 来构建 MaterialData 对象
-        try:
-            material_data = MaterialData.parse_obj(doc)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Data parsing error: {e}")
-        return material_data
+# 预先构建的 TypeAdapter：校验直接走 pydantic-core，不再使用 v1 风格的 parse_obj
+MATERIAL_ADAPTER = TypeAdapter(MaterialData)
+ELASTIC_PROP_ADAPTER = TypeAdapter(ElasticPropData)
+BAND_GAP_ADAPTER = TypeAdapter(BandGap)
+SUMMARY_ADAPTER = TypeAdapter(MaterialSummary)
+
+
+def validate_trusted(adapter: TypeAdapter, data: dict):
+    """ TRUST_DB_DATA 开启时原样返回数据库中的字典，否则按模型校验 """
+    if config.TRUST_DB_DATA:
+        return data
+    return adapter.validate_python(data)
+
+
+def build_material(doc: dict):
+    # 打包的数值数组由 /numeric 接口提供，不放进完整文档的 JSON（不修改原文档，批量接口中还要构建其它 section）
+    doc = {k: v for k, v in doc.items() if k != NUMERIC_FIELD}
+    # 将 _id 转为字符串，如果 _id 为 {"$oid": "..."} 则提取内部字符串
+    if isinstance(doc.get("_id"), dict) and "$oid" in doc["_id"]:
+        doc["_id"] = doc["_id"]["$oid"]
     else:
-        raise HTTPException(status_code=404, detail="Material not found")
+        doc["_id"] = str(doc["_id"])
+    if config.TRUST_DB_DATA:
+        # 信任数据库中的数据：跳过校验，直接由 orjson 序列化原始文档
+        return doc
+    # 使用预先构建的 TypeAdapter 一次性校验为 MaterialData 对象
+    return MATERIAL_ADAPTER.validate_python(doc)
+
+
+@router.get("/material/{material_id}", response_model=MaterialData)
+async def get_material_by_id(material_id: str, request: Request):
+    return cached_response(request, await load_section_body(material_id, "material", build_material))
+
+
+@router.get("/material/{material_id}/similar")
+async def get_similar_materials(material_id: str, k: int = Query(10, ge=1, le=config.SIMILAR_MAX_K),
+                                rerank: bool = True):
+    """ 结构最相近的 k 个材料：先在指纹矩阵上求最近邻，再用 StructureMatcher 对候选重排 """
+    similar = await inflight.run(("similar", material_id, k, rerank), find_similar, material_id, k, rerank)
+    return {"material_id": material_id, "similar": similar}
+
+
+def build_vasp_input_text(doc: dict, section: str) -> str:
+    """ 将 metadata.<opt|scf> 中的 INCAR / KPOINTS / CONTCAR 合并为纯文本 """
+    vasp_data = get_path(doc, f"metadata.{section}", {})
+    INCAR = vasp_data.get("INCAR")
+    KPOINTS = vasp_data.get("KPOINTS")
+    CONTCAR = vasp_data.get("CONTCAR")
+    # 将内容合并为纯文本，可以根据需要调整格式
+    return (
+        f"INCAR:\n{INCAR}"
+        f"KPOINTS:\n{KPOINTS}"
+        f"CONTCAR:\n{CONTCAR}"
+    )
 
 
 @router.get("/opt/{material_id}", response_class=PlainTextResponse)
-async def get_opt_by_id(material_id: str):
-    # 查询 MongoDB（假设 collection 已定义）
-    object_id = ObjectId(material_id)
-    doc = collection.find_one({"_id": object_id})
-    if doc:
-        # 将 _id 转为字符串，如果 _id 为 {"$oid": "..."} 则提取内部字符串
-        if isinstance(doc.get("_id"), dict) and "$oid" in doc["_id"]:
-            doc["_id"] = doc["_id"]["$oid"]
-        else:
-            doc["_id"] = str(doc["_id"])
-        # 使用 Pydantic 的 parse_obj 来构建 MaterialData 对象
-        try:
-            opt_data = doc.get("metadata", {}).get("opt", {})
-            # print(opt_data)
-            INCAR = opt_data.get("INCAR")
-            KPOINTS = opt_data.get("KPOINTS")
-            CONTCAR = opt_data.get("CONTCAR")
-            # 将内容合并为纯文本，可以根据需要调整格式
-            combined_text = (
-                f"INCAR:\n{INCAR}"
-                f"KPOINTS:\n{KPOINTS}"
-                f"CONTCAR:\n{CONTCAR}"
-            )
-            return combined_text
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Data parsing error: {e}")
-    else:
-        raise HTTPException(status_code=404, detail="Material not found")
+async def get_opt_by_id(material_id: str, request: Request):
+    cached = await load_section_body(material_id, "opt", lambda doc: build_vasp_input_text(doc, "opt"), PLAIN_TEXT)
+    return cached_response(request, cached)
 
 
 # @router.get("/opt/{material_id}/incar_file")
@@ -185,211 +205,275 @@ async def get_opt_by_id(material_id: str):
 
 
 @router.get("/scf/{material_id}", response_class=PlainTextResponse)
-async def get_scf_by_id(material_id: str):
-    # 查询 MongoDB（假设 collection 已定义）
-    object_id = ObjectId(material_id)
-    doc = collection.find_one({"_id": object_id})
-    if doc:
-        # 将 _id 转为字符串，如果 _id 为 {"$oid": "..."} 则提取内部字符串
-        if isinstance(doc.get("_id"), dict) and "$oid" in doc["_id"]:
-            doc["_id"] = doc["_id"]["$oid"]
-        else:
-            doc["_id"] = str(doc["_id"])
-        # 使用 Pydantic 的 parse_obj 来构建 MaterialData 对象
-        try:
-            opt_data = doc.get("metadata", {}).get("scf", {})
-            # print(opt_data)
-            INCAR = opt_data.get("INCAR")
-            KPOINTS = opt_data.get("KPOINTS")
-            CONTCAR = opt_data.get("CONTCAR")
-            # 将内容合并为纯文本，可以根据需要调整格式
-            combined_text = (
-                f"INCAR:\n{INCAR}"
-                f"KPOINTS:\n{KPOINTS}"
-                f"CONTCAR:\n{CONTCAR}"
-            )
-            return combined_text
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Data parsing error: {e}")
-    else:
-        raise HTTPException(status_code=404, detail="Material not found")
+async def get_scf_by_id(material_id: str, request: Request):
+    cached = await load_section_body(material_id, "scf", lambda doc: build_vasp_input_text(doc, "scf"), PLAIN_TEXT)
+    return cached_response(request, cached)
+
+
+def build_elastic_text(doc: dict) -> str:
+    elastic_data = get_path(doc, "metadata.elastic", {})
+    INCAR = elastic_data.get("INCAR")
+    KPOINTS = elastic_data.get("KPOINTS")
+    ELASTIC_TENSOR = elastic_data.get("ELASTIC_TENSOR")
+    stiffness_tensor = elastic_data.get("prop_data", {}).get("stiffness_tensor")
+    compliance_tensor = elastic_data.get("prop_data", {}).get("compliance_tensor")
+    # 将内容合并为纯文本，可以根据需要调整格式
+    return (
+        f"INCAR:\n{INCAR}"
+        f"KPOINTS:\n{KPOINTS}"
+        f"ELASTIC_TENSOR:\n{ELASTIC_TENSOR}"
+        f"STIFFNESS_TENSOR:\n{stiffness_tensor}\n"
+        f"COMPLIANCE_TENSOR:\n{compliance_tensor}"
+    )
 
 
 @router.get("/elastic/{material_id}", response_class=PlainTextResponse)
-async def get_elastic_by_id(material_id: str):
-    # 查询 MongoDB（假设 collection 已定义）
-    object_id = ObjectId(material_id)
-    doc = collection.find_one({"_id": object_id})
-    if doc:
-        # 将 _id 转为字符串，如果 _id 为 {"$oid": "..."} 则提取内部字符串
-        if isinstance(doc.get("_id"), dict) and "$oid" in doc["_id"]:
-            doc["_id"] = doc["_id"]["$oid"]
-        else:
-            doc["_id"] = str(doc["_id"])
-        # 使用 Pydantic 的 parse_obj 来构建 MaterialData 对象
-        try:
-            elastic_data = doc.get("metadata", {}).get("elastic", {})
-            # print(opt_data)
-            INCAR = elastic_data.get("INCAR")
-            KPOINTS = elastic_data.get("KPOINTS")
-            ELASTIC_TENSOR = elastic_data.get("ELASTIC_TENSOR")
-            stiffness_tensor = elastic_data.get("prop_data", {}).get("stiffness_tensor")
-            compliance_tensor = elastic_data.get("prop_data", {}).get("compliance_tensor")
-            # 将内容合并为纯文本，可以根据需要调整格式
-            combined_text = (
-                f"INCAR:\n{INCAR}"
-                f"KPOINTS:\n{KPOINTS}"
-                f"ELASTIC_TENSOR:\n{ELASTIC_TENSOR}"
-                f"STIFFNESS_TENSOR:\n{stiffness_tensor}\n"
-                f"COMPLIANCE_TENSOR:\n{compliance_tensor}"
-            )
-            return combined_text
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Data parsing error: {e}")
-    else:
-        raise HTTPException(status_code=404, detail="Material not found")
+async def get_elastic_by_id(material_id: str, request: Request):
+    return cached_response(request, await load_section_body(material_id, "elastic", build_elastic_text, PLAIN_TEXT))
 
 
-@router.get("/ElasticProp/{material_id}", response_model=ElasticPropData)
-async def get_elasticprop_by_id(material_id: str):
-    # 查询 MongoDB（假设 collection 已定义）
-    object_id = ObjectId(material_id)
-    doc = collection.find_one({"_id": object_id})
-    if doc:
-        # 将 _id 转为字符串，如果 _id 为 {"$oid": "..."} 则提取内部字符串
-        if isinstance(doc.get("_id"), dict) and "$oid" in doc["_id"]:
-            doc["_id"] = doc["_id"]["$oid"]
-        else:
-            doc["_id"] = str(doc["_id"])
-        # 使用 Pydantic 的 parse_obj 来构建 MaterialData 对象
-        try:
-            prop_data = doc.get("metadata", {}).get("elastic", {}).get("prop_data", {})
-            # 删除 stiffness_tensor 和 compliance_tensor
-            prop_data.pop("stiffness_tensor", None)
-            prop_data.pop("compliance_tensor", None)
-            return prop_data
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Data parsing error: {e}")
-        # return elastic_data
-    else:
-        raise HTTPException(status_code=404, detail="Material not found")
+def build_elastic_prop(doc: dict):
+    prop_data = get_path(doc, "metadata.elastic.prop_data", {})
+    # 去掉 stiffness_tensor 和 compliance_tensor（不修改原文档，批量接口中同一文档还要构建其它 section）
+    prop_data = {k: v for k, v in prop_data.items() if k not in ("stiffness_tensor", "compliance_tensor")}
+    # 单个与批量接口共用，输出同样经过 ElasticPropData 校验
+    return validate_trusted(ELASTIC_PROP_ADAPTER, prop_data)
 
 
-@router.get("/band/{material_id}", response_model=BandGap)
-async def get_band_by_id(material_id: str):
-    # 查询 MongoDB
-    object_id = ObjectId(material_id)
-    doc = collection.find_one({"_id": object_id})
-
-    if doc:
-        # 处理 _id
-        if isinstance(doc.get("_id"), dict) and "$oid" in doc["_id"]:
-            doc["_id"] = doc["_id"]["$oid"]
-        else:
-            doc["_id"] = str(doc["_id"])
-
-        try:
-            band_data = doc.get("metadata", {}).get("band", {})
+@router.get("/ElasticProp/{material_id}", response_model=ElasticPropData)
+async def get_elasticprop_by_id(material_id: str, request: Request):
+    return cached_response(request, await load_section_body(material_id, "elastic_prop", build_elastic_prop))
 
-            # 确保 band_gap 是一个字典
-            band_gap_data = band_data.get("band_gap", {})
-            if not isinstance(band_gap_data, dict):
-                band_gap_data = {}
 
-            # # 确保 Klabels 是一个字典
-            # klabels_data = band_data.get("Klabels", {})
-            # if not isinstance(klabels_data, dict):
-            #     klabels_data = {}
+def build_band_gap(doc: dict):
+    # 确保 band_gap 是一个字典
+    band_gap_data = get_path(doc, "metadata.band.band_gap", {})
+    if not isinstance(band_gap_data, dict):
+        band_gap_data = {}
+    return validate_trusted(BAND_GAP_ADAPTER, band_gap_data)
 
-            # 解析数据并返回
-            return BandGap.parse_obj(band_gap_data)
 
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Data parsing error: {e}")
+@router.get("/band/{material_id}", response_model=BandGap)
+async def get_band_by_id(material_id: str, request: Request):
+    return cached_response(request, await load_section_body(material_id, "band", build_band_gap))
 
-    else:
-        raise HTTPException(status_code=404, detail="Material not found")
 
+@router.get("/numeric/{material_id}")
+async def get_numeric_by_id(material_id: str, request: Request,
+                            fmt: Literal["json", "binary"] = Query("json", alias="format")):
+    """
+    刚度 / 柔度矩阵、带边能量与 Klabels 的数值表示。
+    format=binary 时返回 little-endian float64 记录，各段长度见 X-Numeric-Layout 响应头，缺失值为 NaN
+    """
+    arrays = await load_section(material_id, "numeric", load_arrays)
+    if fmt == "binary":
+        response = cached_response(request, make_body(arrays_to_record(arrays), OCTET_STREAM))
+        response.headers["X-Numeric-Layout"] = RECORD_LAYOUT_HEADER
+        return response
+    return cached_response(request, make_body(arrays_to_json(arrays)))
 
-@router.get("/material_basicprop/{material_id}", response_model=MaterialSummary)
-async def get_material_basicprop_by_id(material_id: str):
-    # 查询 MongoDB（假设 collection 已定义）
-    object_id = ObjectId(material_id)
-    doc = collection.find_one({"_id": object_id})
 
-    if doc:
-        # 处理 _id
-        doc["_id"] = str(doc["_id"])
+def build_basicprop(doc: dict):
+    # 处理 _id，并过滤掉 structure 和 metadata
+    doc["_id"] = str(doc["_id"])
+    filtered_data = {k: v for k, v in doc.items() if k not in ["structure", "metadata"]}
+    return validate_trusted(SUMMARY_ADAPTER, filtered_data)
 
-        # 过滤掉 structure 和 metadata
-        filtered_data = {k: v for k, v in doc.items() if k not in ["structure", "metadata"]}
-        try:
-            material_basicprop = MaterialSummary.parse_obj(filtered_data)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Data parsing error: {e}")
 
-        return material_basicprop
+@router.get("/material_basicprop/{material_id}", response_model=MaterialSummary)
+async def get_material_basicprop_by_id(material_id: str, request: Request):
+    # 优先使用内存中的摘要索引，新写入但尚未进入索引的材料再查 MongoDB；两种来源的响应体缓存在同一个键下
+    index = get_summary_index()
+    summary = index.get(material_id) if index is not None else None
+    return cached_response(request, await load_section_body(material_id, "basicprop", build_basicprop, doc=summary))
+
+
+# 批量接口可请求的 section 及其构建函数
+SECTION_BUILDERS = {
+    "material": build_material,
+    "opt": lambda doc: build_vasp_input_text(doc, "opt"),
+    "scf": lambda doc: build_vasp_input_text(doc, "scf"),
+    "elastic": build_elastic_text,
+    "elastic_prop": build_elastic_prop,
+    "band": build_band_gap,
+    "basicprop": build_basicprop,
+}
+
+
+class BatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=config.BATCH_MAX_IDS)
+    sections: List[str] = Field(["basicprop"], min_length=1)
+
+
+@router.post("/materials/batch")
+async def get_materials_batch(request: BatchRequest):
+    """ 一次 $in 查询获取多个材料的多个 section，返回 id -> {section: 结果} 以及每个 id 的错误信息 """
+    unknown = [section for section in request.sections if section not in SECTION_BUILDERS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}")
+    builders = {section: SECTION_BUILDERS[section] for section in request.sections}
+    results, errors = await load_sections_batch(request.ids, builders)
+    return {"results": results, "errors": errors}
+
+
+class MechanicsRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=config.MECHANICS_MAX_IDS)
+
+
+@router.post("/materials/mechanics")
+async def get_materials_mechanics(request: MechanicsRequest):
+    """ 一次 $in 查询取回刚度矩阵，对所有材料批量计算 Voigt / Reuss / Hill 模量等力学量 """
+    errors, material_ids = {}, []
+    for material_id in dict.fromkeys(request.ids):
+        if ObjectId.is_valid(material_id):
+            material_ids.append(material_id)
+        else:
+            errors[material_id] = "Invalid ObjectId format"
+
+    query = {"_id": {"$in": [ObjectId(material_id) for material_id in material_ids]}}
+    docs = {str(doc["_id"]): doc async for doc in get_collection().find(query, {f"{NUMERIC_FIELD}.stiffness": 1})}
+    # 只有尚未回填 numeric 的文档才再读取原始刚度矩阵
+    legacy_ids = [doc["_id"] for doc in docs.values() if NUMERIC_FIELD not in doc]
+    if legacy_ids:
+        legacy_query = {"_id": {"$in": legacy_ids}}
+        async for doc in get_collection().find(legacy_query, {LEGACY_STIFFNESS_FIELD: 1}):
+            docs[str(doc["_id"])] = doc
+    found, tensors = [], []
+    for material_id in material_ids:
+        doc = docs.get(material_id)
+        stiffness = load_arrays(doc).get("stiffness") if doc is not None else None
+        if doc is None:
+            errors[material_id] = "Material not found"
+        elif stiffness is None:
+            errors[material_id] = "Stiffness tensor not available"
+        else:
+            found.append(material_id)
+            tensors.append(stiffness)
+    return {"results": mechanics_rows(found, tensors), "errors": errors}
+
+
+# /materials 导出时 fields 可以引用的顶层字段（可带子路径，如 metadata.band）；
+# 打包的二进制数组（NUMERIC_FIELD）无法以 JSON 导出，不在其中
+EXPORT_FIELDS = ("_id", "sacada_id", "formula", "reduced_formula", "crystal_system", "space_group_symbol", "Sites",
+                 "structure", "structure_digest", "metadata", "bdos_url", "source_file")
+
+
+def export_projection(fields: Optional[str]) -> dict:
+    """
+    解析并校验 fields。必须在开始流式响应之前完成：MongoDB 在游标开始迭代时才报告 projection 错误，
+    那时响应头已经以 200 发出，客户端只会收到被截断的响应体
+    """
+    if not fields:
+        return {NUMERIC_FIELD: 0}
+    paths = [field.strip() for field in fields.split(",") if field.strip()]
+    invalid = [path for path in paths
+               if path.split(".")[0] not in EXPORT_FIELDS or any(not part or part.startswith("$")
+                                                                   for part in path.split("."))]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Unknown or unsupported fields: {', '.join(invalid)}")
+    if not paths:
+        raise HTTPException(status_code=400, detail="fields must list at least one field")
+    return paths_projection(paths)
+
+
+@router.get("/materials")
+async def get_materials(fmt: Literal["json", "ndjson"] = Query("json", alias="format"),
+                        fields: Optional[str] = Query(None, description="逗号分隔的字段列表，例如 formula,Sites"),
+                        compress: bool = Query(False, alias="gzip")):
+    """ 流式导出全部材料：边读游标边序列化，内存占用与数据量无关 """
+    projection = export_projection(fields)
+    cursor = get_collection().find({}, projection, batch_size=config.EXPORT_BATCH_SIZE)
+
+    if fmt == "ndjson":
+        chunks, media_type = iter_ndjson(cursor), "application/x-ndjson"
     else:
-        raise HTTPException(status_code=404, detail="Material not found")
-
-
-def get_material_from_db():
-    materials = []
-    for doc in collection.find():
-        doc["_id"] = str(doc["_id"])
-        print(doc)
-        materials.append(MaterialData(data=doc))
-    return materials
+        chunks, media_type = iter_json_array(cursor), JSON
+    headers = {}
+    if compress:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+
+@router.get("/materials/search")
+async def search_materials(crystal_system: Optional[str] = None,
+                           space_group_symbol: Optional[str] = None,
+                           reduced_formula: Optional[str] = None,
+                           sites_min: Optional[int] = Query(None, ge=0),
+                           sites_max: Optional[int] = Query(None, ge=0),
+                           band_gap_min: Optional[float] = None,
+                           band_gap_max: Optional[float] = None,
+                           youngs_modulus_min: Optional[float] = None,
+                           youngs_modulus_max: Optional[float] = None,
+                           cursor: Optional[str] = None,
+                           page_size: int = Query(config.SUMMARY_DEFAULT_PAGE_SIZE, ge=1,
+                                                  le=config.SUMMARY_MAX_PAGE_SIZE)):
+    """ 按晶系、空间群、化学式、原子数以及带隙 / 杨氏模量范围搜索材料，结果按 _id 做 keyset 分页 """
+    index = get_summary_index()
+    numeric_filters = (band_gap_min, band_gap_max, youngs_modulus_min, youngs_modulus_max)
+    if index is not None and all(value is None for value in numeric_filters):
+        # 只涉及摘要字段时在内存索引中过滤，MongoDB 只按 _id 取当前页的带隙 / 杨氏模量
+        rows = index.filter_rows(crystal_system, space_group_symbol, reduced_formula, sites_min, sites_max)
+        if cursor:
+            rows = rows[rows >= index.first_row_after(str(decode_cursor(cursor, "_id")["id"]))]
+        page_ids = [ObjectId(index.ids[row]) for row in rows[:page_size]]
+        docs = await get_collection().find({"_id": {"$in": page_ids}}, SEARCH_PROJECTION).sort("_id", 1).to_list(None)
+        has_more = len(rows) > page_size
+    else:
+        query = build_search_filter(crystal_system, space_group_symbol, reduced_formula, sites_min, sites_max,
+                                    band_gap_min, band_gap_max, youngs_modulus_min, youngs_modulus_max)
+        after = keyset_filter("_id", cursor) if cursor else None
+        # 多取一条判断是否还有下一页，避免最后一页恰好满页时返回指向空页的游标
+        docs = await find_search_page(query, page_size + 1, after).to_list(None)
+        has_more = len(docs) > page_size
+        docs = docs[:page_size]
+    next_cursor = encode_cursor("_id", docs[-1]) if has_more and docs else None
+    return {"materials": [flatten_search_result(doc) for doc in docs], "next": next_cursor}
 
 
-@router.get("/materials", response_model=List[MaterialData])
-async def get_materials():
-    return get_material_from_db()
+SUMMARY_PROJECTION = {"_id": 1, "formula": 1, "reduced_formula": 1, "crystal_system": 1,
+                      "space_group_symbol": 1, "Sites": 1}
 
 
 @router.get("/materials_summary")
-async def get_materials(page: int = Query(1, alias="page")):
-    items_per_page = 10
-    materials = list(
-        collection.find({}, {"_id": 1, "formula": 1, "reduced_formula": 1, "crystal_system": 1,
-                             "space_group_symbol": 1, "Sites": 1})
-        .skip((page - 1) * items_per_page)
-        .limit(items_per_page))
-    total_items = collection.count_documents({})
+async def get_materials(page: int = Query(1, alias="page", ge=1),
+                        cursor: Optional[str] = Query(None, description="上一页返回的 next；传空字符串表示第一页"),
+                        page_size: int = Query(config.SUMMARY_DEFAULT_PAGE_SIZE, ge=1,
+                                               le=config.SUMMARY_MAX_PAGE_SIZE),
+                        sort: SortField = "_id"):
+    items_per_page = page_size
+    index = get_summary_index()
+    if index is not None and sort == "_id":
+        # 内存摘要索引按 _id 排序，直接按行号切片
+        if cursor:
+            start = index.first_row_after(str(decode_cursor(cursor, "_id")["id"]))
+        elif cursor is not None:
+            start = 0
+        else:
+            start = (page - 1) * items_per_page
+        materials = index.page(start, items_per_page)
+        total_items = len(index)
+    else:
+        if cursor is not None:
+            # keyset 分页：从上一页最后一条之后继续，深页与第一页代价相同
+            query = get_collection().find(keyset_filter(sort, cursor), SUMMARY_PROJECTION)
+        else:
+            query = get_collection().find({}, SUMMARY_PROJECTION).skip((page - 1) * items_per_page)
+        materials = await query.sort(sort_spec(sort)).limit(items_per_page).to_list(None)
+        total_items = await total_count.get()
+
+    next_cursor = encode_cursor(sort, materials[-1]) if len(materials) == items_per_page else None
     total_pages = (total_items + items_per_page - 1) // items_per_page  # 计算总页
     # 确保 `_id` 转换为字符串格式
     for material in materials:
         material["_id"] = str(material["_id"])
-    return {"materials": materials, "total_pages": total_pages}
-
-
-import plotly.express as px
-import json
+    return {"materials": materials, "total_pages": total_pages, "total_items": total_items, "next": next_cursor}
 
 
 @router.get("/charts")
-async def update_charts():
-    df_display = pd.DataFrame(list(collection.find({}, {"crystal_system": 1, "space_group_symbol": 1, "Sites": 1})))
-
-    # Crystal System Pie Chart
-    crystal_pie = px.pie(df_display, names="crystal_system", title="Distribution of Crystal Systems")
-
-    # Top 20 Space Group Symbols Pie Chart
-    top_20_space_groups = df_display["space_group_symbol"].value_counts().nlargest(20).index
-    filtered_df = df_display[df_display["space_group_symbol"].isin(top_20_space_groups)]
-    space_group_pie = px.pie(filtered_df, names="space_group_symbol", title="Top 20 Space Group Symbols")
-
-    # Sites Histogram
-    sites_hist = px.histogram(df_display, x="Sites", nbins=10, title="Distribution of Materials by Sites",
-                              marginal="box")
-
-    response = {
-        "crystal_pie": json.loads(crystal_pie.to_json()),
-        "space_group_pie": json.loads(space_group_pie.to_json()),
-        "sites_hist": json.loads(sites_hist.to_json())
-    }
-
-    return response  # ✅ 确保是 JSON 格式，而不是字符串
+async def update_charts(request: Request):
+    # 图表 JSON 已按集合版本缓存为字节，直接返回；数据会随导入变化，客户端每次用 ETag 重新验证
+    return cached_response(request, await chart_cache.get(), cache_control="no-cache")
 
 
 # @router.get("/material/{material_id}")
@@ -406,35 +490,51 @@ async def update_charts():
 
 
 @router.get("/download")
-async def download_csv():
+async def download_csv(request: Request):
     # df = pd.read_csv("static/et_carbon.csv")
-    df_file_path = "static/et_carbon.csv"
+    df_file_path = config.CSV_EXPORT_PATH
     df_file_name = "et_carbon.csv"
-    return FileResponse(df_file_path, filename=df_file_name, media_type="text/csv")
+    return await file_response(request, df_file_path, filename=df_file_name, media_type="text/csv")
 
 
-@router.get("/download/{material_id}")
-async def download_structure_by_id(material_id: str):
-    doc = collection.find_one(ObjectId(material_id))
-    if not doc:
-        raise HTTPException(status_code=404, detail="Material not found")
+@router.get("/dataset")
+async def download_dataset(request: Request,
+                           fmt: DatasetFormat = Query("parquet", alias="format")):
+    """ 由集合生成的全量属性表（Parquet / Arrow IPC）；FileResponse 支持 Range 请求，可断点续传或按需读取行组 """
+    await dataset_exporter.ensure_current()
+    return await file_response(request, dataset_path(fmt), filename=DATASET_FILES[fmt], media_type=MEDIA_TYPES[fmt])
+
+
+def build_cif_entry(doc: dict):
+    """ 缓存结构的内容哈希，命中存储时无需再解析结构 """
     structure_dict = doc.get("structure")
     if not structure_dict:
+        return None
+    return structure_digest(structure_dict), structure_dict
+
+
+@router.get("/download/{material_id}")
+async def download_structure_by_id(material_id: str, request: Request):
+    entry = await load_section(material_id, "cif", build_cif_entry)
+    if not entry:
         raise HTTPException(status_code=404, detail="Structure data not found")
-    try:
-        structure = Structure.from_dict(structure_dict)
-        structure_cif = CifWriter(structure, significant_figures=6)
-        print(structure_cif)
-        cif_filename = f"{material_id}.cif"
-        structure_cif.write_file(f'{str(material_id)}.cif')
-        structure_json = json.dumps(structure.as_dict(), indent=2)
-        structure.to(fmt="cif")
-        # structure.to(filename=cif_filename, fmt="cif")
-        # return {"message": "Structure data retrieved", "structure": structure_json}
-        return FileResponse(cif_filename, filename=cif_filename, media_type="chemical/x-cif")
-        # return FileResponse(structure.to(fmt="cif"))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing structure: {str(e)}")
+    digest, structure_dict = entry
+    path = cif_path(digest)
+    if not os.path.exists(path):
+        # 存储未命中时在线程池中生成，避免 pymatgen 阻塞事件循环
+        try:
+            # 同一结构的并发请求共用一次渲染
+            await inflight.run(("cif", digest), run_in_threadpool, write_cif, structure_dict, digest)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing structure: {str(e)}")
+
+    etag = f'"{digest}"'
+    stat = os.stat(path)
+    if is_not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers={"ETag": etag, "Last-Modified": formatdate(stat.st_mtime, usegmt=True)})
+    cif_filename = f"{material_id}.cif"
+    return await file_response(request, path, filename=cif_filename, media_type="chemical/x-cif", stat_result=stat,
+                               headers={"ETag": etag})
 
 
 @router.get("/get_bdos_url/{material_id}")
@@ -450,54 +550,20 @@ async def download_structure_by_id(material_id: str):
 #         raise HTTPException(status_code=404, detail="BDOS URL not found")
 #
 #     return {"bdos_url": doc["bdos_url"]}
-async def get_bdos_html(material_id: str):
-    """ 根据 material_id 下载、解压并返回 BDOS HTML 内容 """
+async def get_bdos_html(material_id: str, request: Request):
+    """ 根据 material_id 获取 BDOS HTML：异步下载并流式返回，客户端支持 gzip 时直接透传压缩数据 """
     try:
         obj_id = ObjectId(material_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid ObjectId format")
 
-    doc = collection.find_one({"_id": obj_id})
+    doc = await get_collection().find_one({"_id": obj_id}, section_projection("bdos"))
     if not doc or "bdos_url" not in doc:
         raise HTTPException(status_code=404, detail="BDOS URL not found")
 
-    bdos_url = doc["bdos_url"]
-
-    # 下载 .html.gz 文件并保存到临时文件中
-    try:
-        response = requests.get(bdos_url, stream=True)
-        response.raise_for_status()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error downloading file: {e}")
-
-    # 使用 tempfile 创建临时文件
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".html.gz") as tmp_gz:
-        gz_path = tmp_gz.name
-        shutil.copyfileobj(response.raw, tmp_gz)
-
-    # 解压临时 .gz 文件，写入另一个临时文件
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".html", mode="wb") as tmp_html:
-        html_path = tmp_html.name
-    try:
-        with gzip.open(gz_path, "rb") as gz_file, open(html_path, "wb") as html_file:
-            shutil.copyfileobj(gz_file, html_file)
-    except Exception as e:
-        # 清理临时文件
-        os.remove(gz_path)
-        os.remove(html_path)
-        raise HTTPException(status_code=500, detail=f"Error decompressing file: {e}")
-
-    # 读取解压后的 HTML 内容
-    try:
-        with open(html_path, "r", encoding="utf-8") as f:
-            html_content = f.read()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading HTML file: {e}")
-    finally:
-        # 清理临时文件
-        if os.path.exists(gz_path):
-            os.remove(gz_path)
-        if os.path.exists(html_path):
-            os.remove(html_path)
-
-    return HTMLResponse(content=html_content)
+    chunks = await open_bdos(doc["bdos_url"])
+    headers = {"Vary": "Accept-Encoding"}
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(chunks, media_type="text/html", headers=headers)
+    return StreamingResponse(gunzip_chunks(chunks), media_type="text/html", headers=headers)
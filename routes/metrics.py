@@ -0,0 +1,43 @@
+import threading
+
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.responses import PlainTextResponse
+
+from config import config
+from metrics import profiler, render_metrics
+from tokens import require_token
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+# 采样会拖慢事件循环，结果也暴露内部调用栈：启停与读取都需要登录令牌
+def ensure_profiler_enabled():
+    if not config.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+
+
+@router.post("/metrics/profiler/start", dependencies=[Depends(require_token)])
+async def start_profiler():
+    ensure_profiler_enabled()
+    # 在事件循环线程中调用，采样的就是处理请求的线程
+    profiler.start(threading.get_ident())
+    return {"running": True}
+
+
+@router.post("/metrics/profiler/stop", dependencies=[Depends(require_token)])
+async def stop_profiler():
+    ensure_profiler_enabled()
+    profiler.stop()
+    return {"running": False, "samples": profiler.samples}
+
+
+@router.get("/metrics/profiler", response_class=PlainTextResponse, dependencies=[Depends(require_token)])
+async def get_profile():
+    """ collapsed stack 格式的采样结果 """
+    ensure_profiler_enabled()
+    return PlainTextResponse(profiler.collapsed())
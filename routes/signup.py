@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, EmailStr
-from database import users_collection
-import bcrypt
+from pymongo.errors import DuplicateKeyError
+from database import get_users_collection
+from passwords import password_hasher
 
 router = APIRouter()
 
@@ -19,19 +20,17 @@ async def signup(request: SignupRequest):
     if request.password != request.repeat_password:
         raise HTTPException(status_code=400, detail="Passwords do not match")
 
-    # 检查邮箱是否已存在
-    existing_user = users_collection.find_one({"email": request.email})
-    if existing_user:
+    # 加密密码（在 bcrypt 线程池中执行）
+    hashed_password = await password_hasher.hash(request.password)
+
+    # 存储用户信息；email 上有唯一索引，重复注册由 DuplicateKeyError 判断，无需先查询
+    try:
+        await get_users_collection().insert_one({
+            "firstname": request.firstname,
+            "email": request.email,
+            "password_hash": hashed_password
+        })
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    # 加密密码
-    hashed_password = bcrypt.hashpw(request.password.encode("utf-8"), bcrypt.gensalt())
-
-    # 存储用户信息
-    users_collection.insert_one({
-        "firstname": request.firstname,
-        "email": request.email,
-        "password_hash": hashed_password
-    })
-
     return {"message": "User registered successfully"}
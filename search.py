@@ -0,0 +1,50 @@
+from typing import Optional
+
+# 嵌套属性在文档中的路径
+BAND_GAP_FIELD = "metadata.band.band_gap.Band Gap (eV)"
+YOUNGS_MODULUS_FIELD = "metadata.elastic.prop_data.average_youngs_modulus"
+
+SEARCH_PROJECTION = {
+    "_id": 1, "formula": 1, "reduced_formula": 1, "crystal_system": 1, "space_group_symbol": 1, "Sites": 1,
+    BAND_GAP_FIELD: 1, YOUNGS_MODULUS_FIELD: 1,
+}
+
+
+def range_filter(minimum=None, maximum=None) -> Optional[dict]:
+    condition = {}
+    if minimum is not None:
+        condition["$gte"] = minimum
+    if maximum is not None:
+        condition["$lte"] = maximum
+    return condition or None
+
+
+def build_search_filter(crystal_system: str = None, space_group_symbol: str = None, reduced_formula: str = None,
+                        sites_min: int = None, sites_max: int = None,
+                        band_gap_min: float = None, band_gap_max: float = None,
+                        youngs_modulus_min: float = None, youngs_modulus_max: float = None) -> dict:
+    """ 将查询参数转换为 MongoDB 过滤条件，字段顺序与 indexes.py 中的复合索引一致 """
+    query = {}
+    if crystal_system is not None:
+        query["crystal_system"] = crystal_system
+    if space_group_symbol is not None:
+        query["space_group_symbol"] = space_group_symbol
+    if reduced_formula is not None:
+        query["reduced_formula"] = reduced_formula
+    for field, condition in (
+        ("Sites", range_filter(sites_min, sites_max)),
+        (BAND_GAP_FIELD, range_filter(band_gap_min, band_gap_max)),
+        (YOUNGS_MODULUS_FIELD, range_filter(youngs_modulus_min, youngs_modulus_max)),
+    ):
+        if condition:
+            query[field] = condition
+    return query
+
+
+def flatten_search_result(doc: dict) -> dict:
+    """ 把嵌套的带隙和杨氏模量提到顶层 """
+    metadata = doc.pop("metadata", None) or {}
+    doc["_id"] = str(doc["_id"])
+    doc["band_gap"] = (metadata.get("band", {}).get("band_gap") or {}).get("Band Gap (eV)")
+    doc["average_youngs_modulus"] = (metadata.get("elastic", {}).get("prop_data") or {}).get("average_youngs_modulus")
+    return doc
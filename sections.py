@@ -0,0 +1,154 @@
+from bson import ObjectId
+from fastapi import HTTPException
+
+from cache import MISSING, material_cache
+from database import get_collection
+from metrics import timed
+from responses import JSON, CachedBody, make_body
+
+# 每个接口真正需要的字段路径；None 表示整份文档
+# 通过 projection 只让 MongoDB 返回这些子文档，避免把 structure 和各个 VASP 文本都传回来
+SECTION_FIELDS = {
+    "material": None,
+    "opt": ["metadata.opt.INCAR", "metadata.opt.KPOINTS", "metadata.opt.CONTCAR"],
+    "scf": ["metadata.scf.INCAR", "metadata.scf.KPOINTS", "metadata.scf.CONTCAR"],
+    "elastic": [
+        "metadata.elastic.INCAR",
+        "metadata.elastic.KPOINTS",
+        "metadata.elastic.ELASTIC_TENSOR",
+        "metadata.elastic.prop_data.stiffness_tensor",
+        "metadata.elastic.prop_data.compliance_tensor",
+    ],
+    "elastic_prop": ["metadata.elastic.prop_data"],
+    "band": ["metadata.band.band_gap"],
+    "basicprop": ["sacada_id", "formula", "reduced_formula", "crystal_system", "space_group_symbol", "Sites"],
+    "structure": ["structure"],
+    "cif": ["structure"],
+    "bdos": ["bdos_url"],
+    # 打包的数值数组（numeric.py --backfill 写入）
+    "numeric": ["numeric"],
+    # 尚未回填的文档从原始字段现场转换；只在文档缺少 numeric 时才读取
+    "numeric_legacy": [
+        "metadata.elastic.prop_data.stiffness_tensor",
+        "metadata.elastic.prop_data.compliance_tensor",
+        "metadata.band.band_gap",
+        "metadata.band.Klabels",
+    ],
+}
+
+# 字段迁移期间：文档缺少该 section 的全部字段时，再按旧字段的 section 取一次
+SECTION_FALLBACKS = {"numeric": "numeric_legacy"}
+
+
+def section_projection(*sections: str):
+    """ 合并若干 section 的字段路径，生成 find 的 projection；任一 section 需要整份文档时返回 None """
+    fields = set()
+    for section in sections:
+        paths = SECTION_FIELDS[section]
+        if paths is None:
+            return None
+        fields.update(paths)
+    return paths_projection(fields)
+
+
+def paths_projection(paths) -> dict:
+    """ 字段路径 -> 包含式 projection；父路径已包含子路径时去掉子路径，否则 MongoDB 会报 path collision """
+    fields = set(paths)
+    fields = {path for path in fields
+              if not any(path.startswith(other + ".") for other in fields)}
+    return {path: 1 for path in sorted(fields)}
+
+
+def get_path(doc: dict, path: str, default=None):
+    """ 按 "a.b.c" 取嵌套字段，中间缺失或类型不对时返回 default """
+    value = doc
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return default
+        value = value[key]
+    return value
+
+
+async def fetch_section(material_id: str, section: str) -> dict:
+    """ 只取某个 section 所需字段的文档切片，找不到时抛 404 """
+    doc = await get_collection().find_one({"_id": ObjectId(material_id)}, section_projection(section))
+    if not doc:
+        raise HTTPException(status_code=404, detail="Material not found")
+    fallback = SECTION_FALLBACKS.get(section)
+    if fallback is not None and all(get_path(doc, path) is None for path in SECTION_FIELDS[section]):
+        doc.update(await fetch_section(material_id, fallback))
+    return doc
+
+
+async def load_section(material_id: str, section: str, build):
+    """ 先查进程内缓存，未命中时按 projection 取文档并用 build 构建响应数据后写入缓存 """
+    key = (material_id, section)
+    value = material_cache.get(key)
+    if value is not MISSING:
+        return value
+    doc = await fetch_section(material_id, section)
+    try:
+        with timed("pydantic"):
+            value = build(doc)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Data parsing error: {e}")
+    material_cache.set(key, value)
+    return value
+
+
+async def load_section_body(material_id: str, section: str, build, media_type: str = JSON,
+                            doc: dict = None) -> CachedBody:
+    """ 与 load_section 相同，但缓存的是序列化后的响应字节与 ETag；已有文档（如来自摘要索引）时通过 doc 传入，不再查询 MongoDB """
+    key = (material_id, "body", section)
+    cached = material_cache.get(key)
+    if cached is not MISSING:
+        return cached
+    if doc is None:
+        doc = await fetch_section(material_id, section)
+    try:
+        with timed("pydantic"):
+            cached = make_body(build(doc), media_type)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Data parsing error: {e}")
+    material_cache.set(key, cached)
+    return cached
+
+
+async def load_sections_batch(material_ids: list, builders: dict):
+    """
+    批量版本的 load_section：缓存未命中的 (id, section) 通过一次 $in 查询取回，
+    projection 为所需 section 字段的并集。返回 (results, errors)，错误按 id 单独记录。
+    """
+    results, errors, missing = {}, {}, {}
+    for material_id in dict.fromkeys(material_ids):
+        if not ObjectId.is_valid(material_id):
+            errors[material_id] = "Invalid ObjectId format"
+            continue
+        results[material_id] = {}
+        for section in builders:
+            value = material_cache.get((material_id, section))
+            if value is MISSING:
+                missing.setdefault(material_id, []).append(section)
+            else:
+                results[material_id][section] = value
+
+    if missing:
+        sections = {section for needed in missing.values() for section in needed}
+        query = {"_id": {"$in": [ObjectId(material_id) for material_id in missing]}}
+        docs = {str(doc["_id"]): doc async for doc in get_collection().find(query, section_projection(*sections))}
+        for material_id, needed in missing.items():
+            doc = docs.get(material_id)
+            if doc is None:
+                errors[material_id] = "Material not found"
+                results.pop(material_id, None)
+                continue
+            for section in needed:
+                try:
+                    value = builders[section](doc)
+                except Exception as e:
+                    errors[material_id] = f"Data parsing error: {e}"
+                    results.pop(material_id, None)
+                    break
+                material_cache.set((material_id, section), value)
+                results[material_id][section] = value
+    return results, errors
@@ -0,0 +1,50 @@
+import zlib
+
+import orjson
+
+# 多条文档合并成一个块再发送，减少 ASGI send 次数
+CHUNK_SIZE = 64 * 1024
+
+
+def encode_doc(doc: dict) -> bytes:
+    # ObjectId 等 orjson 不支持的 BSON 类型统一转为字符串
+    return orjson.dumps(doc, default=str)
+
+
+async def iter_ndjson(cursor):
+    """ 每行一个 JSON 文档，边从游标读取边输出 """
+    buffer = bytearray()
+    async for doc in cursor:
+        buffer += encode_doc(doc)
+        buffer += b"\n"
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def iter_json_array(cursor):
+    """ 分块输出一个 JSON 数组 """
+    buffer = bytearray(b"[")
+    first = True
+    async for doc in cursor:
+        if not first:
+            buffer += b","
+        first = False
+        buffer += encode_doc(doc)
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b"]"
+    yield bytes(buffer)
+
+
+async def gzip_chunks(chunks, level: int = 6):
+    """ 对分块输出做流式 gzip 压缩 """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,137 @@
+"""
+材料摘要字段的列式内存索引：启动时从 MongoDB 加载一次，之后 /materials_summary、
+/material_basicprop、/charts 以及只涉及摘要字段的搜索都直接在内存中完成。
+
+- 分类字段（晶系、空间群、化学式）做字典编码，存为 int32 编码数组
+- 行按 _id 升序排列，_id -> 行号 用字典索引，keyset 分页用二分查找
+- version_watch 检查到集合版本戳变化时重新加载，随后清理依赖该数据的缓存
+"""
+import bisect
+import logging
+
+import numpy as np
+
+from database import get_collection, get_collection_version
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = ("sacada_id", "formula", "reduced_formula", "crystal_system", "space_group_symbol", "Sites")
+CATEGORICAL_FIELDS = ("reduced_formula", "crystal_system", "space_group_symbol")
+
+
+class Categorical:
+    """ 字典编码的列：codes[i] 为 categories 中的下标，缺失值为 -1 """
+
+    def __init__(self, values):
+        self.categories = sorted({v for v in values if v is not None})
+        self.lookup = {value: code for code, value in enumerate(self.categories)}
+        self.codes = np.fromiter((self.lookup.get(v, -1) if v is not None else -1 for v in values),
+                                 dtype=np.int32, count=len(values))
+
+    def value(self, row: int):
+        code = self.codes[row]
+        return self.categories[code] if code >= 0 else None
+
+    def mask(self, value) -> np.ndarray:
+        code = self.lookup.get(value)
+        if code is None:
+            return np.zeros(len(self.codes), dtype=bool)
+        return self.codes == code
+
+    def counts(self):
+        """ 各取值出现次数，返回 [(value, count)] """
+        counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.categories))
+        return [(self.categories[code], int(count)) for code, count in enumerate(counts) if count]
+
+
+class SummaryIndex:
+    def __init__(self, docs: list, version):
+        self.version = version
+        self.ids = [str(doc["_id"]) for doc in docs]
+        self.row_of = {material_id: row for row, material_id in enumerate(self.ids)}
+        self.sacada_id = np.array([doc.get("sacada_id") for doc in docs], dtype=object)
+        self.formula = np.array([doc.get("formula") for doc in docs], dtype=object)
+        self.categorical = {field: Categorical([doc.get(field) for doc in docs]) for field in CATEGORICAL_FIELDS}
+        # 缺失的原子数记为 -1
+        self.sites = np.array([doc["Sites"] if isinstance(doc.get("Sites"), int) else -1 for doc in docs],
+                              dtype=np.int32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, row: int, with_sacada_id: bool = False) -> dict:
+        """ 与 MongoDB 摘要 projection 的结果一致：缺失字段不输出 """
+        doc = {"_id": self.ids[row]}
+        if with_sacada_id and self.sacada_id[row] is not None:
+            doc["sacada_id"] = self.sacada_id[row]
+        if self.formula[row] is not None:
+            doc["formula"] = self.formula[row]
+        for field in CATEGORICAL_FIELDS:
+            value = self.categorical[field].value(row)
+            if value is not None:
+                doc[field] = value
+        if self.sites[row] >= 0:
+            doc["Sites"] = int(self.sites[row])
+        return doc
+
+    def get(self, material_id: str):
+        row = self.row_of.get(material_id)
+        return None if row is None else self.row(row, with_sacada_id=True)
+
+    def page(self, offset: int, limit: int) -> list:
+        return [self.row(row) for row in range(offset, min(offset + limit, len(self)))]
+
+    def filter_rows(self, crystal_system=None, space_group_symbol=None, reduced_formula=None,
+                    sites_min=None, sites_max=None) -> np.ndarray:
+        """ 返回满足条件的行号（升序，即 _id 顺序） """
+        mask = np.ones(len(self), dtype=bool)
+        for field, value in (("crystal_system", crystal_system), ("space_group_symbol", space_group_symbol),
+                             ("reduced_formula", reduced_formula)):
+            if value is not None:
+                mask &= self.categorical[field].mask(value)
+        if sites_min is not None or sites_max is not None:
+            mask &= self.sites >= 0
+            if sites_min is not None:
+                mask &= self.sites >= sites_min
+            if sites_max is not None:
+                mask &= self.sites <= sites_max
+        return np.flatnonzero(mask)
+
+    def first_row_after(self, material_id: str) -> int:
+        """ keyset 分页：_id 严格大于 material_id 的第一行（24 位十六进制字符串的字典序与 ObjectId 顺序一致） """
+        return bisect.bisect_right(self.ids, material_id)
+
+    def chart_counts(self) -> dict:
+        """ 与 charts.CHART_PIPELINE 的聚合结果格式相同 """
+        space_groups = sorted(self.categorical["space_group_symbol"].counts(), key=lambda item: (-item[1], item[0]))
+        sites, counts = np.unique(self.sites[self.sites >= 0], return_counts=True)
+        return {
+            "crystal_system": [{"_id": v, "count": c} for v, c in self.categorical["crystal_system"].counts()],
+            "space_group_symbol": [{"_id": v, "count": c} for v, c in space_groups[:20]],
+            "Sites": [{"_id": int(v), "count": int(c)} for v, c in zip(sites, counts)],
+        }
+
+
+_current = None
+
+
+def get_summary_index():
+    """ 已加载时返回索引，否则返回 None（调用方回退到 MongoDB 查询） """
+    return _current
+
+
+async def load_summary_index(version=None) -> SummaryIndex:
+    global _current
+    if version is None:
+        version = await get_collection_version()
+    projection = {field: 1 for field in SUMMARY_FIELDS}
+    docs = await get_collection().find({}, projection).sort("_id", 1).to_list(None)
+    _current = SummaryIndex(docs, version)
+    return _current
+
+
+async def refresh_summary_index(version):
+    """ 由 version_watch 在集合版本变化时调用；索引已是该版本时不重建 """
+    if _current is None or version != _current.version:
+        await load_summary_index(version)
+        logger.info("Summary index reloaded: %d materials", len(_current))
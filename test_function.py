@@ -21,7 +21,8 @@ def get_material_from_db():
     return materials
 
 
-get_material_from_db()
+if __name__ == "__main__":
+    get_material_from_db()
 # _id=str(doc["_id"]),
 #             band_gap=doc.get("metadata", {}).get("band", {}).get("band_gap", {}).get("Band Gap (eV)"),
 #             youngs_modulus=doc.get("metadata", {}).get("elastic", {}).get("prop_data", {}).get("average_youngs_modulus"),
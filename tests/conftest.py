@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 服务端模块位于仓库根目录（以 uvicorn main:app 方式运行），测试中按同样的方式导入
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
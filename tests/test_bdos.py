@@ -0,0 +1,208 @@
+"""
+BDOS 预览页面的下载与磁盘缓存：上游用 httpx.MockTransport 模拟，缓存目录放在 tmp_path 下。
+"""
+import asyncio
+import gzip
+import os
+import random
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+import bdos  # noqa: E402
+from bdos import BdosCache, accepts_gzip, gunzip_chunks, open_bdos  # noqa: E402
+
+# 随机内容，压缩后仍有多个 CHUNK，流式转发确实分多块进行
+HTML = b"<html><body><pre>" + random.Random(0).randbytes(160 * 1024).hex().encode() + b"</pre></body></html>"
+CHUNK = bdos.CHUNK_SIZE
+
+
+class ChunkStream(httpx.AsyncByteStream):
+    """ 分块返回数据；gate 未触发时在第一块之后暂停，用于模拟下载进行中 """
+
+    def __init__(self, data: bytes, gate: asyncio.Event = None):
+        self.data = data
+        self.gate = gate
+
+    async def __aiter__(self):
+        for offset in range(0, len(self.data), CHUNK):
+            if offset and self.gate is not None:
+                await self.gate.wait()
+            yield self.data[offset:offset + CHUNK]
+
+
+class Upstream:
+    """ 模拟托管 .html.gz 的上游：支持 ETag / If-None-Match，记录收到的请求 """
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+        self.gate = None
+
+    def publish(self, url: str, html: bytes, etag: str):
+        self.pages[url] = (gzip.compress(html), etag)
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        body, etag = self.pages[str(request.url)]
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, headers={"ETag": etag, "Content-Type": "application/gzip"},
+                              stream=ChunkStream(body, self.gate))
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    server = Upstream()
+    cache = BdosCache(str(tmp_path), max_bytes=10 * 1024 * 1024, ttl_seconds=3600)
+    monkeypatch.setattr(bdos, "bdos_cache", cache)
+    monkeypatch.setattr(bdos, "_client", httpx.AsyncClient(transport=httpx.MockTransport(server.handler)))
+    monkeypatch.setattr(bdos, "_downloads", {})
+    return server
+
+
+async def collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+def part_files(directory) -> list:
+    return [name for name in os.listdir(directory) if name.endswith(".part")]
+
+
+def test_miss_tees_to_cache_then_serves_from_disk(upstream, tmp_path):
+    url = "https://example.com/a.html.gz"
+    upstream.publish(url, HTML, '"v1"')
+
+    async def scenario():
+        first = await collect(await open_bdos(url))
+        second = await collect(await open_bdos(url))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    # 透传上游的 gzip 数据，不解压
+    assert first == second == upstream.pages[url][0]
+    assert len(upstream.requests) == 1
+    data_path, meta = bdos.bdos_cache.lookup(url)
+    with open(data_path, "rb") as f:
+        assert f.read() == first
+    assert meta["etag"] == '"v1"'
+    assert part_files(tmp_path) == []
+
+
+def test_gunzip_for_clients_without_gzip(upstream):
+    url = "https://example.com/a.html.gz"
+    upstream.publish(url, HTML, '"v1"')
+
+    async def scenario():
+        return await collect(gunzip_chunks(await open_bdos(url)))
+
+    assert asyncio.run(scenario()) == HTML
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate, br", True),
+    ("br;q=1.0, gzip;q=0.5", True),
+    ("*", True),
+    ("gzip;q=0", False),
+    ("br", False),
+    (None, False),
+])
+def test_accepts_gzip(accept_encoding, expected):
+    assert accepts_gzip(accept_encoding) is expected
+
+
+def test_stale_entry_revalidated_with_if_none_match(upstream):
+    url = "https://example.com/a.html.gz"
+    upstream.publish(url, HTML, '"v1"')
+
+    async def scenario():
+        await collect(await open_bdos(url))
+        bdos.bdos_cache.ttl_seconds = 0
+        return await collect(await open_bdos(url))
+
+    body = asyncio.run(scenario())
+    assert body == upstream.pages[url][0]
+    assert len(upstream.requests) == 2
+    assert upstream.requests[1].headers["if-none-match"] == '"v1"'
+
+
+def test_stale_entry_replaced_when_upstream_changed(upstream):
+    url = "https://example.com/a.html.gz"
+    upstream.publish(url, HTML, '"v1"')
+    new_html = HTML.replace(b"<pre>", b"<pre>v2\n")
+
+    async def scenario():
+        await collect(await open_bdos(url))
+        bdos.bdos_cache.ttl_seconds = 0
+        upstream.publish(url, new_html, '"v2"')
+        return await collect(gunzip_chunks(await open_bdos(url)))
+
+    assert asyncio.run(scenario()) == new_html
+    assert upstream.requests[1].headers["if-none-match"] == '"v1"'
+    _, meta = bdos.bdos_cache.lookup(url)
+    assert meta["etag"] == '"v2"'
+
+
+def test_client_disconnect_removes_partial_file(upstream, tmp_path):
+    url = "https://example.com/a.html.gz"
+    upstream.publish(url, HTML, '"v1"')
+
+    async def scenario():
+        chunks = await open_bdos(url)
+        await chunks.__anext__()
+        # StreamingResponse 在客户端断开时关闭生成器
+        await chunks.aclose()
+
+    asyncio.run(scenario())
+    assert part_files(tmp_path) == []
+    assert bdos.bdos_cache.lookup(url) == (None, None)
+    assert bdos._downloads == {}
+
+
+def test_eviction_removes_least_recently_used(upstream):
+    urls = [f"https://example.com/{name}.html.gz" for name in "abc"]
+    for url in urls:
+        upstream.publish(url, HTML, '"v1"')
+    size = len(upstream.pages[urls[0]][0])
+    # 只能容纳两个文件
+    bdos.bdos_cache.max_bytes = 2 * size + size // 2
+
+    async def scenario():
+        a, b, c = urls
+        await collect(await open_bdos(a))
+        await collect(await open_bdos(b))
+        os.utime(bdos.bdos_cache.lookup(a)[0], (100, 100))
+        os.utime(bdos.bdos_cache.lookup(b)[0], (200, 200))
+        # 命中缓存会刷新 a 的使用时间，之后 b 成为最久未用的
+        await collect(await open_bdos(a))
+        await collect(await open_bdos(c))
+
+    asyncio.run(scenario())
+    a, b, c = urls
+    assert bdos.bdos_cache.lookup(b) == (None, None)
+    assert not os.path.exists(bdos.bdos_cache.paths(b)[1])
+    assert bdos.bdos_cache.lookup(a)[0] is not None
+    assert bdos.bdos_cache.lookup(c)[0] is not None
+
+
+def test_concurrent_request_waits_for_inflight_download(upstream):
+    url = "https://example.com/a.html.gz"
+    upstream.publish(url, HTML, '"v1"')
+
+    async def scenario():
+        upstream.gate = asyncio.Event()
+        chunks = await open_bdos(url)
+        first_chunk = await chunks.__anext__()
+        waiter = asyncio.create_task(open_bdos(url))
+        await asyncio.sleep(0.05)
+        # 第一个下载尚未结束，第二个请求在等待而不是再请求上游
+        assert not waiter.done()
+        upstream.gate.set()
+        first = first_chunk + await collect(chunks)
+        second = await collect(await waiter)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second == upstream.pages[url][0]
+    assert len(upstream.requests) == 1
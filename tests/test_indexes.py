@@ -0,0 +1,69 @@
+"""
+搜索查询执行计划检查（与 python indexes.py --check 相同）：每个示例查询都应只扫描对应的 ESR 索引，没有内存排序。
+需要本地 mongod：TEST_MONGO_URI，默认 mongodb://localhost:27017，连不上时跳过。
+在独立的测试库中建索引并写入合成文档，结束后删除该库，不会碰 .env 中配置的数据库。
+"""
+import asyncio
+import os
+import random
+
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+
+import database  # noqa: E402
+import indexes  # noqa: E402
+from benchmarks.synthetic import make_material_doc  # noqa: E402
+from config import config  # noqa: E402
+from search import build_search_filter  # noqa: E402
+
+TEST_MONGO_URI = os.environ.get("TEST_MONGO_URI", "mongodb://localhost:27017")
+
+
+@pytest.fixture
+def test_db(monkeypatch):
+    client = pymongo.MongoClient(TEST_MONGO_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError as e:
+        client.close()
+        pytest.skip(f"no mongod reachable at {TEST_MONGO_URI}: {e}")
+    db_name = f"{config.DB}_indexes_test"
+    client.drop_database(db_name)
+    rng = random.Random(0)
+    client[db_name][config.COLLECTION].insert_many([make_material_doc(rng) for _ in range(200)])
+    monkeypatch.setattr(config, "MONGO_URI", TEST_MONGO_URI)
+    monkeypatch.setattr(config, "DB", db_name)
+    monkeypatch.setattr(database, "_client", None)
+    monkeypatch.setattr(indexes, "_search_indexes_ready", False)
+    yield
+    client.drop_database(db_name)
+    client.close()
+
+
+def test_sample_searches_use_esr_indexes(test_db):
+    async def check():
+        try:
+            await indexes.ensure_indexes()
+            return await indexes.check_search_plans()
+        finally:
+            await database.close()
+
+    assert asyncio.run(check()) == []
+
+
+def test_check_fails_without_search_indexes(test_db):
+    # 没有 ESR 索引时只能走 _id_ 或 COLLSCAN，检查必须报告每个示例查询
+    async def check():
+        try:
+            return await indexes.check_search_plans()
+        finally:
+            await database.close()
+
+    failures = asyncio.run(check())
+    assert [params for params, _ in failures] == [params for params, _ in indexes.SAMPLE_SEARCHES]
+
+
+@pytest.mark.parametrize("params, expected", indexes.SAMPLE_SEARCHES)
+def test_search_index_name(params, expected):
+    assert indexes.search_index_name(build_search_filter(**params)) == expected
@@ -0,0 +1,122 @@
+"""
+无状态的签名令牌（HS256 JWT 格式）以及验证用的 FastAPI 依赖。
+
+- 验证只做一次 HMAC 与内存查找，不访问数据库、不调用 bcrypt
+- 已验证的令牌在内存中缓存，重复请求只需一次字典查找
+- 注销 / 刷新时把旧令牌的 jti 记入有上限的吊销列表，直到令牌本身过期
+"""
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from cache import MISSING, TTLCache
+from config import config
+
+_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+# 未配置密钥时随机生成，只在本进程内有效（main 启动时会打印警告）
+SECRET_IS_EPHEMERAL = not config.AUTH_SECRET_KEY
+_SECRET = (config.AUTH_SECRET_KEY or secrets.token_urlsafe(32)).encode("utf-8")
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _sign(signing_input: bytes) -> bytes:
+    return _b64encode(hmac.new(_SECRET, signing_input, hashlib.sha256).digest())
+
+
+def issue_token(subject: str, token_type: str, ttl_seconds: int) -> str:
+    now = int(time.time())
+    claims = {"sub": subject, "typ": token_type, "iat": now, "exp": now + ttl_seconds, "jti": secrets.token_hex(16)}
+    signing_input = _HEADER + b"." + _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return (signing_input + b"." + _sign(signing_input)).decode("ascii")
+
+
+def issue_token_pair(subject: str) -> dict:
+    return {
+        "access_token": issue_token(subject, "access", config.ACCESS_TOKEN_TTL_SECONDS),
+        "refresh_token": issue_token(subject, "refresh", config.REFRESH_TOKEN_TTL_SECONDS),
+        "token_type": "bearer",
+        "expires_in": config.ACCESS_TOKEN_TTL_SECONDS,
+    }
+
+
+class RevocationList:
+    """ 已吊销令牌的 jti -> 过期时间；过期的记录会被清理，总数超过上限时丢弃最早的记录 """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def revoke(self, jti: str, expires_at: int):
+        with self._lock:
+            self._entries[jti] = expires_at
+            if len(self._entries) > self.max_entries:
+                now = time.time()
+                for key in [k for k, exp in self._entries.items() if exp < now]:
+                    del self._entries[key]
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._entries
+
+
+revoked_tokens = RevocationList(config.TOKEN_REVOCATION_MAX_ENTRIES)
+# 令牌 -> claims，命中时跳过 base64 / JSON 解析与 HMAC 计算
+_verified = TTLCache(config.TOKEN_VERIFY_CACHE_SIZE, config.TOKEN_VERIFY_CACHE_TTL_SECONDS)
+
+
+def decode_token(token: str, token_type: str = "access") -> dict:
+    claims = _verified.get(token)
+    if claims is MISSING:
+        try:
+            signing_input, _, signature = token.encode("ascii").rpartition(b".")
+            if not hmac.compare_digest(signature, _sign(signing_input)):
+                raise ValueError("bad signature")
+            claims = json.loads(_b64decode(signing_input.split(b".")[1]))
+        except Exception:
+            raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+        _verified.set(token, claims)
+
+    if claims.get("typ") != token_type:
+        raise HTTPException(status_code=401, detail="Invalid token type", headers={"WWW-Authenticate": "Bearer"})
+    if claims["exp"] < time.time():
+        raise HTTPException(status_code=401, detail="Token expired", headers={"WWW-Authenticate": "Bearer"})
+    if revoked_tokens.is_revoked(claims["jti"]):
+        raise HTTPException(status_code=401, detail="Token revoked", headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+
+def revoke_token(claims: dict):
+    revoked_tokens.revoke(claims["jti"], claims["exp"])
+
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def require_token(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> dict:
+    """ FastAPI 依赖：校验 Authorization: Bearer <access_token>，返回令牌中的 claims """
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return decode_token(credentials.credentials)
+
+
+async def materials_guard(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+    """ 材料接口的可选鉴权：AUTH_REQUIRED_FOR_MATERIALS 开启时才要求令牌 """
+    if config.AUTH_REQUIRED_FOR_MATERIALS:
+        await require_token(credentials)
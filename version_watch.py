@@ -0,0 +1,37 @@
+"""
+材料集合版本戳的后台检查：无论摘要索引是否启用都会运行。
+版本变化时先执行各个 refresh（例如重建摘要索引），再清空单个材料的缓存，
+避免清空后又从旧的摘要索引重新填充缓存。
+"""
+import asyncio
+import logging
+
+from cache import invalidate_material
+from database import get_collection_version
+
+logger = logging.getLogger(__name__)
+
+
+async def watch_collection_version_forever(interval: float, refreshers=()):
+    """ refreshers 为 async (version) -> None；任一失败时不记录新版本，下一轮重试并再次清空缓存 """
+    last_version = None
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            version = await get_collection_version()
+        except Exception as e:
+            logger.warning("Failed to read collection version: %s", e)
+            continue
+        if version == last_version:
+            continue
+        refreshed = True
+        for refresh in refreshers:
+            try:
+                await refresh(version)
+            except Exception as e:
+                refreshed = False
+                logger.warning("Failed to run %s: %s", refresh.__name__, e)
+        # 启动后第一次检查时 last_version 为 None，也清空一次：期间可能已有导入
+        invalidate_material()
+        if refreshed:
+            last_version = version